@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Run a resumable batch of generations from a JSONL jobs file.
+
+Each line of the jobs file is a GenerationParams dict, optionally with a
+stable "job_id" and "filename". Progress is checkpointed to an append-only
+log; re-running the same command after a crash or spot-instance preemption
+picks up exactly where it stopped. With several endpoints, each pulls its
+next job from one shared queue, so faster GPUs take more of the work.
+
+With --autotune, a job that leaves out "batch_size" is generated at the
+batch size tuned for its GPU and so yields that many tracks, not one. Set
+"batch_size" in a job to pin it; values above the GPU's limit are capped
+with a warning.
+
+Usage:
+    python scripts/batch-generate.py jobs.jsonl
+    python scripts/batch-generate.py jobs.jsonl --endpoint http://gpu-1:8001 --endpoint http://gpu-2:8001
+    python scripts/batch-generate.py jobs.jsonl --checkpoint runs/catalog.ckpt --retry-failed
+    python scripts/batch-generate.py jobs.jsonl --autotune
+    python scripts/batch-generate.py jobs.jsonl --interactive-reserve 4   # shared with web app
+    python scripts/batch-generate.py jobs.jsonl --trace runs/catalog.trace.jsonl
+"""
+
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+import click
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rich.console import Console
+
+from src import tracing
+from src.batch import BatchRunner, CheckpointLog, JobManifest
+from src.config import get_settings
+from src.storage import get_storage
+
+
+@click.command()
+@click.argument("jobs_file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--checkpoint", type=click.Path(dir_okay=False, path_type=Path),
+              help="Checkpoint log (default: <jobs_file>.ckpt)")
+@click.option("--endpoint", "endpoints", multiple=True,
+              help="ACE-Step API URL; repeat for several servers (default: ACESTEP_API_URL)")
+@click.option("--max-inflight", default=32, help="Max tasks outstanding on each endpoint")
+@click.option("--interactive-reserve", default=0,
+              help="Slots per endpoint left free for web /generate users on a shared server")
+@click.option("--download-concurrency", default=4, help="Parallel downloads per endpoint")
+@click.option("--retry-failed", is_flag=True, help="Resubmit jobs recorded as failed")
+@click.option("--autotune", is_flag=True,
+              help="Probe each endpoint and tune batch size and concurrency to its GPU. "
+                   "Jobs without a batch_size then produce the tuned number of tracks "
+                   "each; set batch_size in a job to pin it")
+@click.option("--trace", "trace_file", type=click.Path(dir_okay=False, path_type=Path),
+              help="Write timing spans here (summarize with scripts/trace-summary.py)")
+@click.option("--verbose", "-v", is_flag=True, help="Log progress of each job")
+def main(
+    jobs_file: Path,
+    checkpoint: Path | None,
+    endpoints: tuple[str, ...],
+    max_inflight: int,
+    interactive_reserve: int,
+    download_concurrency: int,
+    retry_failed: bool,
+    autotune: bool,
+    trace_file: Path | None,
+    verbose: bool,
+) -> None:
+    """Generate every job in JOBS_FILE, resuming from the checkpoint log."""
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING)
+    if trace_file:
+        tracing.configure(file=trace_file)
+    try:
+        asyncio.run(_run(
+            jobs_file, checkpoint, list(endpoints), max_inflight, interactive_reserve,
+            download_concurrency, retry_failed, autotune,
+        ))
+    finally:
+        tracing.shutdown()
+
+
+async def _run(
+    jobs_file: Path,
+    checkpoint_path: Path | None,
+    endpoints: list[str],
+    max_inflight: int,
+    interactive_reserve: int,
+    download_concurrency: int,
+    retry_failed: bool,
+    autotune: bool,
+) -> None:
+    console = Console()
+    settings = get_settings()
+    endpoints = endpoints or [settings.acestep_api_url]
+    checkpoint_path = checkpoint_path or jobs_file.with_suffix(".ckpt")
+
+    try:
+        manifest = JobManifest(jobs_file)
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+    console.print("\n[bold]ACE-Step Batch Generation[/bold]")
+    console.print(f"  Jobs: {len(manifest)} from {jobs_file}")
+    console.print(f"  Endpoints: {', '.join(endpoints)}")
+    console.print(f"  Checkpoint: {checkpoint_path}")
+    console.print()
+
+    checkpoint = CheckpointLog(checkpoint_path)
+    runner = BatchRunner(
+        endpoints,
+        settings.acestep_api_key,
+        output_dir=Path(settings.output_dir),
+        checkpoint=checkpoint,
+        max_inflight=max_inflight,
+        download_concurrency=download_concurrency,
+        poll_interval=settings.poll_interval,
+        timeout=settings.poll_timeout,
+        retry_failed=retry_failed,
+        storage=get_storage(),
+        autotune=autotune,
+        interactive_reserve=interactive_reserve,
+    )
+    try:
+        summary = await runner.run(manifest)
+    finally:
+        checkpoint.close()
+
+    console.print("[green bold]Batch finished[/green bold]")
+    console.print(f"  Already done: {summary.skipped}")
+    console.print(f"  Resumed in flight: {summary.resumed}")
+    console.print(f"  Submitted: {summary.submitted}")
+    console.print(f"  Downloaded: {summary.downloaded}")
+    if summary.unsubmitted:
+        console.print(
+            f"  [yellow]Not submitted: {summary.unsubmitted}[/yellow] "
+            "(no endpoint was reachable; re-run to submit them)"
+        )
+    if summary.failed:
+        console.print(f"  [red]Failed: {summary.failed}[/red] (re-run with --retry-failed)")
+        for job_id, error in list(summary.errors.items())[:10]:
+            console.print(f"    {job_id}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Export tracks from the library as a ZIP or tar with a metadata sidecar.
+
+Streams straight from the database and audio files to the output, so the
+whole catalog can be exported with constant memory.
+
+Usage:
+    python scripts/export-tracks.py catalog.zip
+    python scripts/export-tracks.py spa.tar --format tar --search spa --metadata json
+    python scripts/export-tracks.py - --since 2026-02-01 --until 2026-03-01 > feb.zip
+"""
+
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import click
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rich.console import Console
+
+from src.web.database import close_db, init_db
+from src.web.export import ExportFilter, stream_archive
+
+
+@click.command()
+@click.argument("output", type=click.Path(dir_okay=False, allow_dash=True))
+@click.option("--format", "archive_format", default="zip", type=click.Choice(["zip", "tar"]))
+@click.option("--metadata", default="csv", type=click.Choice(["csv", "json"]),
+              help="Sidecar format")
+@click.option("--status", default="completed", help="Track status to export (empty for all)")
+@click.option("--search", default="", help="Filter by prompt or lyrics")
+@click.option("--since", type=click.DateTime(), help="Created on or after this date")
+@click.option("--until", type=click.DateTime(), help="Created before this date")
+def main(
+    output: str,
+    archive_format: str,
+    metadata: str,
+    status: str,
+    search: str,
+    since: datetime | None,
+    until: datetime | None,
+) -> None:
+    """Write an export archive of matching tracks to OUTPUT ("-" for stdout)."""
+    selection = ExportFilter(
+        search_query=search or None,
+        status=status or None,
+        created_after=since,
+        created_before=until,
+    )
+    asyncio.run(_export(selection, output, archive_format, metadata))
+
+
+async def _export(selection: ExportFilter, output: str, archive_format: str, metadata: str) -> None:
+    console = Console(stderr=True)
+    await init_db()
+    total = 0
+    try:
+        with click.open_file(output, "wb") as f:
+            async for chunk in stream_archive(selection, archive_format, metadata):
+                f.write(chunk)
+                total += len(chunk)
+    finally:
+        await close_db()
+
+    console.print(f"[green]Exported {total / 1024 / 1024:.1f} MB to {output}[/green]")
+
+
+if __name__ == "__main__":
+    main()
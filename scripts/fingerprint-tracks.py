@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Fingerprint library tracks and report near-duplicates.
+
+New tracks are fingerprinted automatically when the web UI finishes them;
+this backfills tracks generated before that (or imported from elsewhere)
+and prints groups of tracks that sound almost the same.
+
+Usage:
+    python scripts/fingerprint-tracks.py
+    python scripts/fingerprint-tracks.py --max-distance 4 --force
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import click
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rich.console import Console
+from rich.table import Table
+
+from src.config import get_settings
+from src.fingerprint import compute_fingerprint
+from src.storage import get_storage
+from src.web import database as db
+
+
+@click.command()
+@click.option("--max-distance", type=int,
+              help="Hamming distance for near-duplicates (default: setting)")
+@click.option("--force", is_flag=True, help="Recompute fingerprints that already exist")
+@click.option("--workers", default=os.cpu_count() or 2, help="Parallel decode/FFT workers")
+def main(max_distance: int | None, force: bool, workers: int) -> None:
+    """Backfill fingerprints, then list near-duplicate tracks."""
+    settings = get_settings()
+    distance = settings.fingerprint_max_distance if max_distance is None else max_distance
+    asyncio.run(_run(distance, force, workers))
+
+
+async def _run(max_distance: int, force: bool, workers: int) -> None:
+    console = Console()
+    storage = get_storage()
+    slots = asyncio.Semaphore(workers)
+    await db.init_db()
+
+    async def fingerprint(track: db.Track) -> bool:
+        async with slots:
+            path = await storage.fetch(Path(track.file_path).name)
+            if path is None:
+                return False
+            try:
+                value = await asyncio.to_thread(compute_fingerprint, path)
+            except Exception as e:
+                console.print(f"[yellow]Track {track.id}: {e}[/yellow]")
+                return False
+        await db.save_fingerprint(track.id, value)
+        return True
+
+    try:
+        pending = []
+        async for track in db.iter_tracks(status="completed", with_files=True):
+            existing = None if force else await db.get_fingerprint(track.id)
+            if existing is None:
+                pending.append(fingerprint(track))
+        done = sum(await asyncio.gather(*pending))
+        console.print(f"Fingerprinted {done} of {len(pending)} tracks needing it")
+
+        table = Table(title=f"Near-duplicates (distance <= {max_distance})")
+        table.add_column("Track")
+        table.add_column("Similar to")
+        seen: set[int] = set()
+        async for track in db.iter_tracks(status="completed", with_files=True):
+            if track.id in seen:
+                continue
+            value = await db.get_fingerprint(track.id)
+            if value is None:
+                continue
+            similar = await db.find_similar_tracks(value, max_distance, exclude_track_id=track.id)
+            if similar:
+                seen.update(other.id for other, _ in similar)
+                table.add_row(
+                    f"#{track.id} {track.prompt[:40]}",
+                    ", ".join(f"#{other.id} (d={dist})" for other, dist in similar),
+                )
+    finally:
+        await db.close_db()
+
+    console.print(table if table.row_count else "[green]No near-duplicates found[/green]")
+
+
+if __name__ == "__main__":
+    main()
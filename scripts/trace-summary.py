@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Summarize where tracks spend their time, from a span trace file.
+
+Record a trace by setting TRACE_FILE (web app) or passing --trace to
+batch-generate.py, then point this script at the file. Spans are grouped
+by ACE-Step task; each track's end-to-end time is split into stages along
+its critical path:
+
+    submit     /release_task call
+    server     queue wait plus generation on the ACE-Step server
+    download   audio download(s)
+    post       post-processing (hashing, storage, checkpoint)
+    db         database / checkpoint writes outside post-processing
+    waiting    gaps between stages (local queues, worker contention)
+
+The stage with the largest share of total time is the one to scale.
+
+Usage:
+    python scripts/trace-summary.py traces.jsonl
+    python scripts/trace-summary.py traces.jsonl --top 10
+"""
+
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+import click
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from rich.console import Console
+from rich.table import Table
+
+STAGES = {
+    "ace.generate": "submit",
+    "ace.wait": "server",
+    "ace.download": "download",
+    "postprocess": "post",
+}
+STAGE_ORDER = ["submit", "server", "download", "post", "db", "waiting"]
+
+
+def _stage(name: str) -> str | None:
+    if name in STAGES:
+        return STAGES[name]
+    if name.startswith(("db.", "checkpoint.")):
+        return "db"
+    return None
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def load_tasks(path: Path) -> tuple[dict[str, list[dict]], dict[str, int]]:
+    """Spans per task_id, and the number of polls that covered each task."""
+    by_task: dict[str, list[dict]] = defaultdict(list)
+    polls: dict[str, int] = defaultdict(int)
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                span = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            attributes = span.get("attributes", {})
+            if span["name"] == "ace.poll":
+                for task_id in attributes.get("task_ids", []):
+                    polls[task_id] += 1
+                continue
+            if attributes.get("task_id"):
+                by_task[attributes["task_id"]].append(span)
+    return by_task, polls
+
+
+def critical_path(spans: list[dict]) -> tuple[float, dict[str, float]]:
+    """End-to-end seconds and seconds per stage for one task.
+
+    Spans nested inside another span of the same task are already counted
+    in their parent and are skipped.
+    """
+    ids = {span["span_id"] for span in spans}
+    start = min(span["start_time_unix_nano"] for span in spans)
+    end = max(span["end_time_unix_nano"] for span in spans)
+    total = (end - start) / 1e9
+
+    stages: dict[str, float] = defaultdict(float)
+    for span in spans:
+        stage = _stage(span["name"])
+        if stage is None or span.get("parent_span_id") in ids:
+            continue
+        stages[stage] += (span["end_time_unix_nano"] - span["start_time_unix_nano"]) / 1e9
+    stages["waiting"] = max(0.0, total - sum(stages.values()))
+    return total, stages
+
+
+@click.command()
+@click.argument("trace_file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--top", default=5, help="Slowest tracks to list")
+def main(trace_file: Path, top: int) -> None:
+    """Report critical-path latency per stage across the tracks in TRACE_FILE."""
+    console = Console()
+    by_task, polls = load_tasks(trace_file)
+    if not by_task:
+        console.print("[yellow]No task spans found[/yellow]")
+        return
+
+    totals: dict[str, float] = {}
+    per_stage: dict[str, list[float]] = defaultdict(list)
+    breakdowns: dict[str, dict[str, float]] = {}
+    for task_id, spans in by_task.items():
+        total, stages = critical_path(spans)
+        totals[task_id] = total
+        breakdowns[task_id] = stages
+        for stage, seconds in stages.items():
+            per_stage[stage].append(seconds)
+
+    grand_total = sum(totals.values()) or 1e-9
+    table = Table(title=f"Critical path across {len(totals)} tracks")
+    table.add_column("Stage")
+    for column in ("Tracks", "p50 (s)", "p95 (s)", "Max (s)", "Share"):
+        table.add_column(column, justify="right")
+    shares = {}
+    for stage in STAGE_ORDER:
+        values = per_stage.get(stage)
+        if not values:
+            continue
+        shares[stage] = sum(values) / grand_total
+        table.add_row(
+            stage,
+            str(len(values)),
+            f"{_percentile(values, 0.5):.2f}",
+            f"{_percentile(values, 0.95):.2f}",
+            f"{max(values):.2f}",
+            f"{shares[stage]:.0%}",
+        )
+    end_to_end = list(totals.values())
+    table.add_row(
+        "[bold]end-to-end[/bold]",
+        str(len(end_to_end)),
+        f"{_percentile(end_to_end, 0.5):.2f}",
+        f"{_percentile(end_to_end, 0.95):.2f}",
+        f"{max(end_to_end):.2f}",
+        "100%",
+    )
+    console.print(table)
+
+    if polls:
+        counted = [polls.get(task_id, 0) for task_id in totals]
+        console.print(f"Polls per track: avg {sum(counted) / len(counted):.1f}, max {max(counted)}")
+    bottleneck = max(shares, key=shares.get)
+    console.print(f"Largest share of time: [bold]{bottleneck}[/bold] ({shares[bottleneck]:.0%})")
+
+    if top > 0:
+        slow = Table(title=f"Slowest {top} tracks")
+        slow.add_column("Task")
+        slow.add_column("Total (s)", justify="right")
+        slow.add_column("Breakdown")
+        for task_id in sorted(totals, key=totals.get, reverse=True)[:top]:
+            stages = breakdowns[task_id]
+            slow.add_row(
+                task_id[:12],
+                f"{totals[task_id]:.2f}",
+                ", ".join(f"{s} {stages[s]:.2f}" for s in STAGE_ORDER if stages.get(s)),
+            )
+        console.print(slow)
+
+
+if __name__ == "__main__":
+    main()
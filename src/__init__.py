@@ -1,6 +1,30 @@
 """ACE Music Platform — BMAsia Group AI music creation."""
 
-from src.ace_client import AceStepClient
-from src.config import Settings
+from __future__ import annotations
 
-__all__ = ["AceStepClient", "Settings"]
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.ace_client import AceStepClient
+    from src.config import Settings
+    from src.pipeline import GenerationPipeline
+
+__all__ = ["AceStepClient", "GenerationPipeline", "Settings"]
+
+
+def __getattr__(name: str):
+    # Resolved lazily so importing a submodule (e.g. src.config) does not pull
+    # in httpx and the client for short-lived scripts.
+    if name == "AceStepClient":
+        from src.ace_client import AceStepClient
+
+        return AceStepClient
+    if name == "GenerationPipeline":
+        from src.pipeline import GenerationPipeline
+
+        return GenerationPipeline
+    if name == "Settings":
+        from src.config import Settings
+
+        return Settings
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
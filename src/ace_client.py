@@ -15,13 +15,20 @@ Usage:
 from __future__ import annotations
 
 import asyncio
+import json
 import time
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
+from urllib.parse import parse_qs, urlparse
 
 import httpx
 from pydantic import BaseModel
 
+from src import tracing
+
+if TYPE_CHECKING:
+    from src.storage import TrackStorage
+
 
 class GenerationParams(BaseModel):
     """Parameters for a music generation request."""
@@ -49,6 +56,33 @@ class TaskResult(BaseModel):
     status: int  # 0=queued, 1=success, 2=failed
     result: str = ""
 
+    @property
+    def audio_paths(self) -> list[str]:
+        """Server-side audio paths of a successful task (one per batch item).
+
+        ``result`` is a plain path for single outputs; batched tasks return a
+        JSON list of paths or of dicts with a "file"/"path" entry, where the
+        file may be a ``/v1/audio?path=...`` URL.
+        """
+        if not self.result.startswith("["):
+            return [self.result] if self.result else []
+        try:
+            items = json.loads(self.result)
+        except json.JSONDecodeError:
+            return [self.result]
+
+        paths = []
+        for item in items:
+            if isinstance(item, dict):
+                item = item.get("file") or item.get("path") or item.get("audio_path") or ""
+            if not isinstance(item, str):
+                continue
+            if item.startswith("/v1/audio"):
+                item = parse_qs(urlparse(item).query).get("path", [item])[0]
+            if item:
+                paths.append(item)
+        return paths
+
 
 class AceStepClient:
     """Async client for the ACE-Step v1.5 REST API.
@@ -107,19 +141,23 @@ class AceStepClient:
         else:
             payload = params
 
-        resp = await self._client.post("/release_task", json=payload)
-        resp.raise_for_status()
-        data = resp.json()
+        with tracing.span("ace.generate", endpoint=self.base_url) as span:
+            resp = await self._client.post("/release_task", json=payload)
+            resp.raise_for_status()
+            data = resp.json()
+            if span:
+                span.set("task_id", data["task_id"])
         return data["task_id"]
 
     async def poll_results(self, task_ids: list[str]) -> list[TaskResult]:
         """Batch poll task statuses. Returns list of TaskResult."""
-        resp = await self._client.post(
-            "/query_result",
-            json={"task_id_list": task_ids},
-        )
-        resp.raise_for_status()
-        raw = resp.json()
+        with tracing.span("ace.poll", task_ids=task_ids, task_count=len(task_ids)):
+            resp = await self._client.post(
+                "/query_result",
+                json={"task_id_list": task_ids},
+            )
+            resp.raise_for_status()
+            raw = resp.json()
         # API returns a list of dicts with task_id, status, result
         if isinstance(raw, list):
             return [TaskResult(**item) for item in raw]
@@ -133,6 +171,12 @@ class AceStepClient:
         timeout: float = 300.0,
     ) -> TaskResult:
         """Poll until a task completes or fails. Raises TimeoutError on timeout."""
+        with tracing.bind_task(task_id), tracing.span("ace.wait"):
+            return await self._wait_for_completion(task_id, poll_interval, timeout)
+
+    async def _wait_for_completion(
+        self, task_id: str, poll_interval: float, timeout: float
+    ) -> TaskResult:
         start = time.monotonic()
         while True:
             elapsed = time.monotonic() - start
@@ -155,22 +199,34 @@ class AceStepClient:
 
     # ── Audio Download ───────────────────────────────────────────────
 
-    async def download_audio(self, audio_path: str, output_path: Path) -> Path:
+    async def download_audio(
+        self,
+        audio_path: str,
+        output_path: Path,
+        storage: TrackStorage | None = None,
+    ) -> Path:
         """Download a generated audio file to local disk.
 
         Args:
             audio_path: Server-side path returned in task result.
             output_path: Local path to save the audio file.
+            storage: Tiered storage to register the file with. When given, the
+                file is archived to the cold tier and the hot cache is trimmed.
 
         Returns:
             The output_path where the file was saved.
         """
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        resp = await self._client.get("/v1/audio", params={"path": audio_path})
-        resp.raise_for_status()
+        with tracing.span("ace.download", path=str(output_path)) as span:
+            resp = await self._client.get("/v1/audio", params={"path": audio_path})
+            resp.raise_for_status()
 
-        output_path.write_bytes(resp.content)
+            output_path.write_bytes(resp.content)
+            if span:
+                span.set("bytes", len(resp.content))
+        if storage is not None:
+            await storage.add(output_path)
         return output_path
 
     # ── Convenience ──────────────────────────────────────────────────
@@ -182,6 +238,7 @@ class AceStepClient:
         filename: str | None = None,
         poll_interval: float = 2.0,
         timeout: float = 300.0,
+        storage: TrackStorage | None = None,
     ) -> Path:
         """Generate a track and download the result in one call.
 
@@ -191,6 +248,7 @@ class AceStepClient:
             filename: Override filename (default: auto from task_id).
             poll_interval: Seconds between status polls.
             timeout: Max seconds to wait for completion.
+            storage: Tiered storage to register the file with (see download_audio).
 
         Returns:
             Path to the downloaded audio file.
@@ -207,7 +265,7 @@ class AceStepClient:
             filename = f"{task_id}.{params_obj.audio_format}"
 
         output_path = output_dir / filename
-        return await self.download_audio(result.result, output_path)
+        return await self.download_audio(result.result, output_path, storage)
 
     async def format_input(
         self,
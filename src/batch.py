@@ -0,0 +1,482 @@
+"""Resumable batch generation with an append-only checkpoint log.
+
+Every state change of every job is appended (and fsynced) to a JSONL
+checkpoint log before the runner moves on:
+
+    {"event": "submitted",  "job_id": "17", "task_id": "...", "endpoint": "http://gpu-1:8001"}
+    {"event": "completed",  "job_id": "17", "task_id": "...", "result": "/tmp/out.mp3"}
+    {"event": "downloaded", "job_id": "17", "path": "outputs/17.mp3", "sha256": "..."}
+    {"event": "downloaded", "job_id": "18", "path": "outputs/18.mp3", "sha256": "...",
+     "extra": [{"path": "outputs/18-2.mp3", "sha256": "..."}]}   # batch_size > 1
+    {"event": "failed",     "job_id": "17", "task_id": "...", "error": "..."}
+
+Replaying the log on restart tells the runner exactly where it stopped:
+downloaded jobs are skipped, tasks still running on a server are polled
+again instead of being resubmitted, and only tasks the server no longer
+knows about (e.g. after a GPU pod was preempted) are submitted anew, which
+appends a fresh "submitted" event.
+
+Job state lives in a compact TaskRegistry (src/registry.py); the jobs file
+is indexed by byte offset and each job's params are parsed only when it is
+fed to the pipeline, so memory stays flat however long the jobs file is.
+
+Work flows through one GenerationPipeline per endpoint (see src/pipeline.py).
+New jobs sit in one queue shared by all endpoints and each pipeline pulls
+the next job only when it has room, so a fast GPU takes more of the run
+than a slow one. A job an endpoint cannot submit because the server is
+down goes back on the queue instead of failing. Each pipeline takes BATCH-priority slots from the
+endpoint's SubmissionScheduler (src/scheduler.py); ``interactive_reserve``
+slots are left free for people using the web app's /generate form on the
+same server.
+
+With ``autotune`` each endpoint is probed first and its pipeline runs at the
+measured batch size and concurrency (see src/capacity.py).
+
+Usage:
+    runner = BatchRunner(["http://gpu-1:8001", "http://gpu-2:8001"], api_key,
+                         output_dir=Path("outputs"), checkpoint=CheckpointLog(Path("run.ckpt")))
+    summary = await runner.run(JobManifest(Path("jobs.jsonl")))
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterator
+
+import httpx
+from pydantic import ValidationError
+
+from src import tracing
+from src.ace_client import AceStepClient, GenerationParams
+from src.capacity import EndpointTuner
+from src.pipeline import GenerationPipeline, PipelineJob, PipelineResult
+from src.registry import TaskRecord, TaskRegistry
+from src.scheduler import Priority, get_scheduler
+
+if TYPE_CHECKING:
+    from src.storage import TrackStorage
+
+log = logging.getLogger(__name__)
+
+# Consecutive submissions an endpoint may fail for server-side reasons
+# (unreachable, 5xx) before it stops taking new jobs
+MAX_SUBMIT_FAILURES = 3
+
+
+@dataclass
+class BatchJob:
+    """One track to generate. job_id must be stable across restarts."""
+
+    job_id: str
+    params: GenerationParams
+    filename: str = ""
+
+
+@dataclass
+class BatchSummary:
+    """Counts for a finished (or resumed) batch run."""
+
+    skipped: int = 0
+    resumed: int = 0
+    submitted: int = 0
+    downloaded: int = 0
+    failed: int = 0
+    unsubmitted: int = 0  # Left pending because no endpoint would take them
+    errors: dict[str, str] = field(default_factory=dict)
+
+
+class JobManifest:
+    """Index of a JSONL jobs file; each job's params are parsed on demand.
+
+    Each line is a GenerationParams dict with an optional "job_id" (defaults
+    to the line number) and "filename" (defaults to "<job_id>.<audio_format>").
+    Opening the manifest reads the file once, validating every job and
+    registering its id and byte offset in ``registry``, so a bad line fails
+    the run before anything is submitted; ``load`` re-reads a single line.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.registry = TaskRegistry()
+        offset = 0
+        with path.open("rb") as f:
+            for lineno, raw in enumerate(f, start=1):
+                line = raw.strip()
+                if line and not line.startswith(b"#"):
+                    data = json.loads(line)
+                    job_id = str(data.pop("job_id", lineno))
+                    data.pop("filename", None)
+                    try:
+                        GenerationParams.model_validate(data)
+                    except ValidationError as e:
+                        raise ValueError(f"{path}:{lineno}: invalid job {job_id!r}: {e}") from e
+                    self.registry.add(job_id, offset)
+                offset += len(raw)
+
+    def __len__(self) -> int:
+        return len(self.registry)
+
+    def load(self, record: TaskRecord) -> BatchJob:
+        """Parse one job's full params from the file."""
+        with self.path.open("rb") as f:
+            f.seek(record.offset)
+            data = json.loads(f.readline())
+        data.pop("job_id", None)
+        filename = data.pop("filename", "")
+        return BatchJob(record.key, GenerationParams(**data), filename)
+
+
+def file_sha256(path: Path) -> str:
+    """Hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CheckpointLog:
+    """Append-only JSONL write-ahead log of batch job events."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._drop_torn_tail()
+        self._file = self.path.open("a", encoding="utf-8")
+
+    def _drop_torn_tail(self) -> None:
+        """Truncate a partial last line left by a crash mid-write.
+
+        Otherwise the next record would be appended to it and lost on replay.
+        """
+        if not self.path.exists():
+            return
+        with self.path.open("r+b") as f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            while pos > 0:
+                start = max(0, pos - 4096)
+                f.seek(start)
+                newline = f.read(pos - start).rfind(b"\n")
+                if newline != -1:
+                    pos = start + newline + 1
+                    break
+                pos = start
+            if pos < end:
+                log.warning("Dropping torn last line of %s", self.path)
+                f.truncate(pos)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+    def record(self, event: str, job_id: str, **fields: Any) -> None:
+        """Append one event and fsync it before returning."""
+        entry = {"event": event, "job_id": job_id, "ts": time.time(), **fields}
+        task = {"task_id": fields["task_id"]} if "task_id" in fields else {}
+        with tracing.span("checkpoint.write", event=event, job_id=job_id, **task):
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def replay(self, registry: TaskRegistry) -> None:
+        """Apply the log to the registry's jobs. Torn lines and unknown jobs are ignored."""
+        if not self.path.exists():
+            return
+
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    log.warning("Ignoring torn checkpoint line in %s", self.path)
+                    continue
+
+                row = registry.row(entry["job_id"])
+                if row is None:
+                    continue
+                event = entry["event"]
+                registry.update(
+                    row,
+                    event,
+                    task_id=entry.get("task_id"),
+                    endpoint=entry.get("endpoint"),
+                    error=entry.get("error", ""),
+                    at=entry.get("ts"),
+                )
+
+
+def _endpoint_error(error: Exception) -> bool:
+    """True if a failed submission is the server's fault rather than the job's."""
+    if isinstance(error, httpx.TransportError):
+        return True
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code >= 500
+
+
+class _JobQueue:
+    """New jobs of a run, shared by every endpoint.
+
+    A job an endpoint takes but cannot submit is put back for the others;
+    ``get`` waits while any taken job may still come back.
+    """
+
+    def __init__(self, records: Iterator[TaskRecord]) -> None:
+        self._records = records
+        self._returned: deque[TaskRecord] = deque()
+        self._taken: set[str] = set()
+        self._changed = asyncio.Event()
+
+    async def get(self) -> TaskRecord | None:
+        """The next job, or None once no job is left or can come back."""
+        while True:
+            record = self._returned.popleft() if self._returned else next(self._records, None)
+            if record is not None:
+                self._taken.add(record.key)
+                return record
+            if not self._taken:
+                return None
+            self._changed.clear()
+            await self._changed.wait()
+
+    def settle(self, key: str) -> None:
+        """A taken job was submitted, or failed for good."""
+        self._taken.discard(key)
+        self._changed.set()
+
+    def put_back(self, record: TaskRecord) -> None:
+        self._taken.discard(record.key)
+        self._returned.append(record)
+        self._changed.set()
+
+    def drain(self) -> int:
+        """Empty the queue, returning how many jobs were left in it."""
+        left = len(self._returned) + sum(1 for _ in self._records)
+        self._returned.clear()
+        return left
+
+
+class BatchRunner:
+    """Run a list of BatchJobs across one or more ACE-Step endpoints, resumably.
+
+    Each endpoint gets its own GenerationPipeline; the checkpoint log is
+    written from the pipeline's stage hooks. An endpoint that fails
+    MAX_SUBMIT_FAILURES submissions in a row because its server is down
+    stops taking new jobs and hands them back to the others.
+
+    Args:
+        endpoints: ACE-Step API base URLs. Each pulls new jobs from a shared queue.
+        api_key: API key shared by all endpoints.
+        output_dir: Directory for downloaded audio (ignored when storage is given).
+        checkpoint: Write-ahead log used to record and resume progress.
+        max_inflight: Max tasks outstanding on each endpoint.
+        download_concurrency: Parallel downloads per endpoint.
+        poll_interval: Seconds between batched status polls per endpoint.
+        timeout: Max seconds to wait for one task after (re)attaching to it.
+        retry_failed: Resubmit jobs the log records as failed.
+        storage: Tiered storage to write downloads into.
+        autotune: Probe each endpoint and adapt batch size and concurrency to it
+            (max_inflight stays the upper bound).
+        interactive_reserve: Of max_inflight, slots per endpoint the run leaves
+            free for interactive requests (the scheduler's batch lane).
+    """
+
+    def __init__(
+        self,
+        endpoints: list[str],
+        api_key: str,
+        output_dir: Path,
+        checkpoint: CheckpointLog,
+        max_inflight: int = 32,
+        download_concurrency: int = 4,
+        poll_interval: float = 2.0,
+        timeout: float = 300.0,
+        retry_failed: bool = False,
+        storage: TrackStorage | None = None,
+        autotune: bool = False,
+        interactive_reserve: int = 0,
+    ) -> None:
+        if not endpoints:
+            raise ValueError("At least one endpoint is required")
+        if not 0 <= interactive_reserve < max_inflight:
+            raise ValueError("interactive_reserve must be in [0, max_inflight)")
+        self.endpoints = endpoints
+        self.api_key = api_key
+        self.output_dir = output_dir
+        self.checkpoint = checkpoint
+        self.max_inflight = max_inflight
+        self.download_concurrency = download_concurrency
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.retry_failed = retry_failed
+        self.storage = storage
+        self.autotune = autotune
+        self.interactive_reserve = interactive_reserve
+
+    def _output_path(self, job: BatchJob) -> Path:
+        filename = job.filename or f"{job.job_id}.{job.params.audio_format}"
+        if self.storage is not None:
+            return self.storage.path_for(filename)
+        return self.output_dir / filename
+
+    def _wanted(self, record: TaskRecord) -> bool:
+        return not (
+            record.state == "downloaded" or (record.state == "failed" and not self.retry_failed)
+        )
+
+    async def run(self, manifest: JobManifest) -> BatchSummary:
+        """Run all jobs to completion, resuming from the checkpoint log."""
+        registry = manifest.registry
+        self.checkpoint.replay(registry)
+        summary = BatchSummary()
+        resumed: dict[str, list[int]] = {endpoint: [] for endpoint in self.endpoints}
+
+        for record in registry.records():
+            if not self._wanted(record):
+                summary.skipped += 1
+                continue
+            if record.state not in ("submitted", "completed"):
+                continue
+            if record.endpoint not in resumed:
+                # Its server is gone from this run (e.g. a preempted GPU pod): the task is lost
+                log.warning(
+                    "Job %s was on %s, which is not an endpoint of this run; resubmitting",
+                    record.key, record.endpoint,
+                )
+                registry.update(record.row, "pending", task_id="")
+                continue
+            # Still on (or finished on) a server: attach instead of resubmitting
+            summary.resumed += 1
+            log.info("Resuming job %s (task %s on %s)", record.key, record.task_id, record.endpoint)
+            resumed[record.endpoint].append(record.row)
+
+        shared = _JobQueue(
+            self._new_jobs(manifest, {row for rows in resumed.values() for row in rows})
+        )
+        await asyncio.gather(*(
+            self._run_endpoint(endpoint, manifest, resumed[endpoint], shared, summary)
+            for endpoint in self.endpoints
+        ))
+        summary.unsubmitted = shared.drain()
+        if summary.unsubmitted:
+            log.warning("%d jobs were not submitted: no endpoint accepted them",
+                        summary.unsubmitted)
+        return summary
+
+    def _new_jobs(self, manifest: JobManifest, resumed: set[int]) -> Iterator[TaskRecord]:
+        """Jobs to submit, as one queue shared by every endpoint."""
+        for record in manifest.registry.records("pending", "failed"):
+            if record.row not in resumed and self._wanted(record):
+                yield record
+
+    def _pipeline_job(self, manifest: JobManifest, record: TaskRecord) -> PipelineJob:
+        """Load a job's params; resumed jobs attach to their task instead of resubmitting."""
+        job = manifest.load(record)
+        task_id = record.task_id if record.state in ("submitted", "completed") else ""
+        return PipelineJob(job.job_id, job.params, self._output_path(job), task_id)
+
+    async def _run_endpoint(
+        self,
+        endpoint: str,
+        manifest: JobManifest,
+        resumed: list[int],
+        shared: _JobQueue,
+        summary: BatchSummary,
+    ) -> None:
+        registry = manifest.registry
+        submit_failures = 0
+
+        async def jobs() -> AsyncIterator[PipelineJob]:
+            """This endpoint's resumed jobs, then new jobs pulled as it has room."""
+            for row in resumed:
+                yield self._pipeline_job(manifest, TaskRecord(registry, row))
+            while (record := await shared.get()) is not None:
+                if submit_failures >= MAX_SUBMIT_FAILURES:
+                    # Leave the rest of the queue to endpoints that accept work
+                    shared.put_back(record)
+                    log.warning("%s failed %d submissions in a row; no longer taking jobs",
+                                endpoint, submit_failures)
+                    return
+                yield self._pipeline_job(manifest, record)
+
+        async def on_submit_failed(job: PipelineJob, error: Exception) -> bool:
+            nonlocal submit_failures
+            if not _endpoint_error(error):
+                shared.settle(job.key)
+                return False
+            # The job is fine; hand it to an endpoint whose server is up
+            submit_failures += 1
+            row = registry.row(job.key)
+            registry.update(row, "pending", task_id="")
+            shared.put_back(TaskRecord(registry, row))
+            return True
+
+        async def on_submitted(job: PipelineJob, task_id: str) -> None:
+            nonlocal submit_failures
+            submit_failures = 0
+            shared.settle(job.key)
+            self.checkpoint.record("submitted", job.key, task_id=task_id, endpoint=endpoint)
+            registry.update(registry.row(job.key), "submitted", task_id=task_id, endpoint=endpoint)
+            summary.submitted += 1
+
+        async def on_finished(job: PipelineJob, result: PipelineResult) -> None:
+            self.checkpoint.record(
+                "completed", job.key, task_id=result.task_id, result=result.audio_path
+            )
+            registry.update(registry.row(job.key), "completed")
+
+        async def record_download(job: PipelineJob, result: PipelineResult) -> None:
+            # Runs before the pipeline hands the file to storage, which may evict it later
+            hashes = [await asyncio.to_thread(file_sha256, path) for path in result.paths]
+            extra = [
+                {"path": str(path), "sha256": sha256}
+                for path, sha256 in zip(result.paths[1:], hashes[1:])
+            ]
+            self.checkpoint.record(
+                "downloaded", job.key, path=str(result.path), sha256=hashes[0],
+                **({"extra": extra} if extra else {}),
+            )
+            registry.update(registry.row(job.key), "downloaded")
+
+        async with AceStepClient(endpoint, self.api_key) as client:
+            tuner = None
+            if self.autotune:
+                tuner = await EndpointTuner.probe(client, max_concurrency=self.max_inflight)
+            pipeline = GenerationPipeline(
+                client,
+                max_inflight=self.max_inflight,
+                download_concurrency=self.download_concurrency,
+                poll_interval=self.poll_interval,
+                timeout=self.timeout,
+                storage=self.storage,
+                on_submitted=on_submitted,
+                on_submit_failed=on_submit_failed,
+                on_finished=on_finished,
+                postprocess=record_download,
+                tuner=tuner,
+                scheduler=get_scheduler(
+                    endpoint,
+                    max_inflight=self.max_inflight,
+                    interactive_reserve=self.interactive_reserve,
+                ),
+                priority=Priority.BATCH,
+            )
+            async for result in pipeline.run(jobs()):
+                if result.status == "completed":
+                    summary.downloaded += 1
+                    continue
+                log.warning("Batch job %s failed: %s", result.key, result.error)
+                self.checkpoint.record(
+                    "failed", result.key, task_id=result.task_id, error=result.error
+                )
+                registry.update(registry.row(result.key), "failed", error=result.error)
+                summary.failed += 1
+                summary.errors[result.key] = result.error
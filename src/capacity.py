@@ -0,0 +1,270 @@
+"""Per-endpoint GPU capacity discovery and runtime auto-tuning.
+
+Different GPU classes peak at different batch sizes and queue depths
+(docs/RESEARCH.md, "VRAM Tier Behavior"). Instead of one static
+``default_batch_size``, each endpoint is probed once:
+
+1. ``health()`` / ``list_models()`` — reachability, model, and VRAM when the
+   server reports it. VRAM picks the tier limits (max batch size and
+   duration); unknown VRAM allows the top tier and relies on calibration.
+2. Timed calibration runs — short generations at doubling batch sizes until
+   throughput stops improving or a run fails (OOM), then increasing numbers
+   of concurrent tasks until extra queue depth stops paying off.
+
+The resulting EndpointTuner keeps adapting while work runs: it hill-climbs
+concurrency on measured throughput and halves the batch size when tasks
+start failing, never leaving the tier limits.
+
+Usage:
+    async with AceStepClient(url, key) as client:
+        tuner = await EndpointTuner.probe(client)
+        pipeline = GenerationPipeline(client, tuner=tuner)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+from src.ace_client import AceStepClient, GenerationParams
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TierLimits:
+    """ACE-Step limits for GPUs with at least ``min_vram_gb`` of memory."""
+
+    min_vram_gb: float
+    max_duration: float
+    max_batch_size: int
+
+
+# From docs/RESEARCH.md — keep in sync with ACE-Step's auto-detection table
+VRAM_TIERS = (
+    TierLimits(0, 30, 1),
+    TierLimits(6, 30, 1),
+    TierLimits(8, 60, 2),
+    TierLimits(12, 120, 4),
+    TierLimits(16, 300, 6),
+    TierLimits(24, 600, 8),
+)
+
+
+def tier_for_vram(vram_gb: float | None) -> TierLimits:
+    """Tier limits for a GPU. Unknown VRAM gets the top tier."""
+    if vram_gb is None:
+        return VRAM_TIERS[-1]
+    return [tier for tier in VRAM_TIERS if vram_gb >= tier.min_vram_gb][-1]
+
+
+def vram_from_health(health: dict[str, Any]) -> float | None:
+    """Best-effort GPU memory (GB) from a /health payload; None if not reported."""
+    candidates = [health, health.get("gpu") or {}, health.get("device") or {}]
+    for source in candidates:
+        if not isinstance(source, dict):
+            continue
+        for key in ("vram_gb", "gpu_memory_gb", "memory_total_gb", "total_memory_gb"):
+            if isinstance(source.get(key), (int, float)):
+                return float(source[key])
+        for key in ("memory_total", "total_memory"):
+            # Raw bytes (or MiB on some builds)
+            value = source.get(key)
+            if isinstance(value, (int, float)) and value > 0:
+                return value / 1024**3 if value > 1024**2 else value / 1024
+    return None
+
+
+class EndpointTuner:
+    """Batch size and concurrency for one endpoint, adapted from live throughput.
+
+    Args:
+        endpoint: Server base URL (for logging).
+        limits: Tier limits the tuner may never exceed.
+        batch_size: Starting batch size (clamped to the tier).
+        concurrency: Starting number of tasks to keep on the server.
+        max_concurrency: Upper bound for concurrency.
+        window: Completed tasks per adaptation step.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        limits: TierLimits,
+        batch_size: int = 1,
+        concurrency: int = 2,
+        max_concurrency: int = 8,
+        window: int = 20,
+    ) -> None:
+        self.endpoint = endpoint
+        self.limits = limits
+        self.batch_size = max(1, min(batch_size, limits.max_batch_size))
+        self.max_concurrency = max_concurrency
+        self.concurrency = max(1, min(concurrency, max_concurrency))
+        self.window = window
+        self.latency_ewma: float | None = None
+        self._clamped: set[tuple[str, float]] = set()
+
+        self._direction = 1
+        self._prev_throughput: float | None = None
+        self._window_start = time.monotonic()
+        self._window_tasks = 0
+        self._window_tracks = 0
+        self._window_failures = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"EndpointTuner({self.endpoint!r}, batch_size={self.batch_size}, "
+            f"concurrency={self.concurrency}, max_duration={self.limits.max_duration})"
+        )
+
+    def apply(self, params: GenerationParams) -> GenerationParams:
+        """Params fitted to this endpoint.
+
+        A job that leaves ``batch_size`` unset gets the tuned batch size, so
+        it produces that many tracks. A job that sets it keeps its own, capped
+        at the tier maximum. Durations are capped at the tier maximum too.
+        Each distinct cap is logged once as a warning.
+        """
+        update: dict[str, Any] = {}
+        if "batch_size" not in params.model_fields_set:
+            update["batch_size"] = self.batch_size
+        elif params.batch_size > self.limits.max_batch_size:
+            self._warn_clamp("batch size", params.batch_size, self.limits.max_batch_size)
+            update["batch_size"] = self.limits.max_batch_size
+        if params.audio_duration > self.limits.max_duration:
+            self._warn_clamp("duration", params.audio_duration, self.limits.max_duration)
+            update["audio_duration"] = self.limits.max_duration
+        return params.model_copy(update=update) if update else params
+
+    def _warn_clamp(self, what: str, value: float, limit: float) -> None:
+        if (what, value) in self._clamped:
+            return
+        self._clamped.add((what, value))
+        log.warning(
+            "%s: %s %g exceeds this GPU tier's limit; capping jobs at %g",
+            self.endpoint, what, value, limit,
+        )
+
+    def observe(self, ok: bool, tracks: int, latency: float) -> None:
+        """Record one finished task (tracks = audio files it produced)."""
+        self.latency_ewma = (
+            latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        )
+        self._window_tasks += 1
+        self._window_tracks += tracks if ok else 0
+        self._window_failures += not ok
+        if self._window_tasks >= self.window:
+            self._adapt()
+
+    def _adapt(self) -> None:
+        elapsed = max(time.monotonic() - self._window_start, 1e-6)
+        throughput = self._window_tracks / elapsed
+
+        if self._window_failures * 4 >= self._window_tasks and self.batch_size > 1:
+            # A quarter of tasks failing at this batch size usually means OOM
+            self.batch_size = max(1, self.batch_size // 2)
+            log.warning(
+                "%s: failures at batch size, reducing to %d", self.endpoint, self.batch_size
+            )
+            self._prev_throughput = None
+        else:
+            if self._prev_throughput is not None and throughput < self._prev_throughput * 1.05:
+                # Last step did not pay off: head the other way
+                self._direction = -self._direction
+            self.concurrency = max(1, min(self.max_concurrency, self.concurrency + self._direction))
+            self._prev_throughput = throughput
+
+        log.debug(
+            "%s: %.2f tracks/s, latency %.1fs -> batch %d, concurrency %d",
+            self.endpoint, throughput, self.latency_ewma or 0, self.batch_size, self.concurrency,
+        )
+        self._window_start = time.monotonic()
+        self._window_tasks = self._window_tracks = self._window_failures = 0
+
+    @classmethod
+    async def probe(
+        cls,
+        client: AceStepClient,
+        calibration_duration: float = 10.0,
+        max_concurrency: int = 8,
+        poll_interval: float = 0.25,
+        timeout: float = 120.0,
+    ) -> EndpointTuner:
+        """Discover an endpoint's limits and calibrate batch size and concurrency.
+
+        Never raises for server or network errors: a failed calibration step
+        counts like an OOM, and an unreachable endpoint ends up at batch size 1,
+        concurrency 1 (its tasks then fail or time out in the pipeline).
+        """
+        try:
+            vram = vram_from_health(await client.health())
+        except httpx.HTTPError as e:
+            log.warning("%s: health check failed: %s", client.base_url, e)
+            vram = None
+        limits = tier_for_vram(vram)
+        try:
+            models = await client.list_models()
+            model = models.get("default_model", "")
+        except Exception:
+            model = ""
+        log.info(
+            "%s: model %s, VRAM %s, tier max batch %d / %.0fs",
+            client.base_url, model or "?", f"{vram:.0f}GB" if vram else "unknown",
+            limits.max_batch_size, limits.max_duration,
+        )
+
+        duration = min(calibration_duration, limits.max_duration)
+
+        async def timed_run(batch_size: int, concurrent: int) -> float | None:
+            """Tracks per second for `concurrent` tasks of `batch_size`, or None on failure."""
+            params = GenerationParams(
+                prompt="calibration run, simple ambient pad",
+                audio_duration=duration,
+                batch_size=batch_size,
+            )
+            start = time.monotonic()
+            try:
+                task_ids = [await client.generate(params) for _ in range(concurrent)]
+                await asyncio.gather(*(
+                    client.wait_for_completion(task_id, poll_interval, timeout)
+                    for task_id in task_ids
+                ))
+            except (RuntimeError, TimeoutError, httpx.HTTPError) as e:
+                # A rejected or dropped request fails the step just like an OOM
+                log.info("%s: calibration batch %d x%d failed: %s",
+                         client.base_url, batch_size, concurrent, e)
+                return None
+            return batch_size * concurrent / (time.monotonic() - start)
+
+        # Batch size: double until throughput gains < 10% or a run fails
+        best_batch, best_tp = 1, await timed_run(1, 1) or 0.0
+        ladder = sorted({min(b, limits.max_batch_size) for b in (2, 4, 8)} - {1})
+        for batch in ladder if best_tp > 0 else []:
+            tp = await timed_run(batch, 1)
+            if tp is None or tp < best_tp * 1.1:
+                break
+            best_batch, best_tp = batch, tp
+
+        # Concurrency: add queued tasks until throughput gains < 5%
+        best_concurrency = 1
+        for concurrent in range(2, max_concurrency + 1):
+            tp = await timed_run(best_batch, concurrent)
+            if tp is None or tp < best_tp * 1.05:
+                break
+            best_concurrency, best_tp = concurrent, tp
+
+        tuner = cls(
+            client.base_url,
+            limits,
+            batch_size=best_batch,
+            concurrency=best_concurrency,
+            max_concurrency=max_concurrency,
+        )
+        log.info("%s: calibrated %.2f tracks/s -> %r", client.base_url, best_tp, tuner)
+        return tuner
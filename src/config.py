@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+from functools import lru_cache
 from pathlib import Path
 
 from pydantic_settings import BaseSettings
@@ -25,6 +26,15 @@ class Settings(BaseSettings):
     # Output
     output_dir: Path = Path("outputs")
 
+    # Tiered storage: output_dir is the hot cache. Eviction only happens when a
+    # cold tier is configured ("/path", "file:///path" or "s3://bucket/prefix").
+    hot_cache_max_mb: int = 10240
+    cold_storage_url: str = ""
+    s3_endpoint_url: str = ""
+    s3_access_key_id: str = ""
+    s3_secret_access_key: str = ""
+    s3_region: str = ""
+
     # Generation defaults
     default_duration: int = 120
     default_format: str = "mp3"
@@ -35,6 +45,33 @@ class Settings(BaseSettings):
     poll_interval: float = 2.0
     poll_timeout: float = 300.0
 
+    # Reconciliation of queued/generating tracks with the server (0 = startup only)
+    reconcile_interval: float = 60.0
+
+    # Scheduling: tasks this process keeps outstanding per ACE-Step server.
+    # Batch work never takes the last scheduler_interactive_reserve slots.
+    scheduler_max_inflight: int = 16
+    scheduler_interactive_reserve: int = 4
+
+    # Admission control for submissions: global and per-client token buckets
+    # (0 = unlimited) and how many may wait locally for a scheduler slot
+    admission_rate_per_minute: float = 120.0
+    admission_burst: int = 20
+    admission_max_pending: int = 32
+    admission_max_pending_batch: int = 10000
+    user_rate_limit_per_minute: float = 10.0
+    user_rate_limit_burst: int = 5
+
+    # Tracing: spans per track stage to a JSONL file and/or an OTLP/HTTP
+    # collector (e.g. http://localhost:4318/v1/traces); both empty = off
+    trace_file: str = ""
+    trace_otlp_endpoint: str = ""
+    trace_service_name: str = "ace-music"
+
+    # Duplicate detection: max Hamming distance (of 64 bits) for "near-duplicate"
+    fingerprint_max_distance: int = 6
+    fingerprint_workers: int = 2
+
     # Web UI
     web_host: str = "127.0.0.1"
     web_port: int = 8000
@@ -47,6 +84,11 @@ class Settings(BaseSettings):
     }
 
 
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
-    """Load settings from environment/.env file."""
+    """Load settings from environment/.env file.
+
+    Parsed once per process and cached; call ``get_settings.cache_clear()``
+    to pick up changed environment variables.
+    """
     return Settings()
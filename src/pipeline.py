@@ -0,0 +1,465 @@
+"""Staged generation pipeline: submit → poll → download → post-process.
+
+``AceStepClient.generate_and_download`` runs those steps in sequence for a
+single track, so a slow download holds up the next submission. The pipeline
+instead runs each step as its own pool of workers, connected by bounded
+queues:
+
+    jobs ─▶ [submitters] ─▶ server ─▶ [poller] ─▶ [downloaders] ─▶ [post-processors] ─▶ results
+
+- Submitters keep up to ``max_inflight`` tasks on the server. A slot is
+  freed the moment the server reports a task finished, before its audio is
+  downloaded, so the GPU never waits on our network egress.
+- A single poller checks every in-flight task with one ``query_result``
+  call per ``poll_batch`` tasks.
+- ACE-Step runs tasks one after another, so a task's timeout starts only
+  once every task submitted before it has left the server. A task that
+  times out keeps its slot until the server finishes or drops it (or a
+  second timeout passes), so abandoned work still counts against
+  ``max_inflight``.
+- Bounded queues give backpressure: when downloads fall behind, the poller
+  waits (results stay on the server) and memory stays bounded.
+- Each stage's concurrency is tuned independently.
+- With a SubmissionScheduler (src/scheduler.py) every task also holds one of
+  its slots at the pipeline's priority, so a bulk run in the batch lane
+  leaves the scheduler's interactive reserve free on a shared server.
+- With an EndpointTuner (src/capacity.py) the submit limit and batch size
+  follow the endpoint's measured capacity instead of fixed settings, and
+  every track of a batched task is downloaded.
+
+Usage:
+    async with AceStepClient(url, key) as client:
+        pipeline = GenerationPipeline(client, max_inflight=16, download_concurrency=8)
+        async for result in pipeline.run(jobs):
+            print(result.key, result.status, result.path)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable
+
+from src import tracing
+from src.ace_client import AceStepClient, GenerationParams, TaskResult
+from src.scheduler import Priority
+
+if TYPE_CHECKING:
+    from src.capacity import EndpointTuner
+    from src.scheduler import Slot, SubmissionScheduler
+    from src.storage import TrackStorage
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class PipelineJob:
+    """One track to generate.
+
+    Set ``task_id`` to attach to a task already submitted (e.g. when resuming);
+    the job then skips the submit stage.
+    """
+
+    key: str
+    params: GenerationParams
+    output_path: Path
+    task_id: str = ""
+
+
+@dataclass
+class PipelineResult:
+    """Outcome of a job. status is "completed" or "failed".
+
+    ``path`` is the first downloaded track; ``paths`` holds every track of a
+    batched task (``output_path``, then ``<stem>-2<suffix>``, ...).
+    """
+
+    key: str
+    task_id: str = ""
+    status: str = "failed"
+    path: Path | None = None
+    paths: list[Path] = field(default_factory=list)
+    audio_path: str = ""
+    error: str = ""
+    submitted_at: float = 0.0
+    finished_at: float = 0.0
+    downloaded_at: float = 0.0
+
+
+@dataclass
+class _Item:
+    job: PipelineJob
+    result: PipelineResult
+    audio_paths: list[str] = field(default_factory=list)
+    started_at: float | None = None  # Became the oldest of our tasks on the server
+    abandoned_at: float | None = None  # Timed out, but may still be on the server
+
+
+class _Gate:
+    """Counting semaphore whose limit may change while it is held."""
+
+    def __init__(self, limit: Callable[[], int]) -> None:
+        self._limit = limit
+        self._held = 0
+        self._changed = asyncio.Event()
+
+    async def acquire(self) -> None:
+        while self._held >= self._limit():
+            self._changed.clear()
+            await self._changed.wait()
+        self._held += 1
+
+    def release(self) -> None:
+        self._held -= 1
+        self._changed.set()
+
+
+SubmitHook = Callable[[PipelineJob, str], Awaitable[None]]
+SubmitFailedHook = Callable[[PipelineJob, Exception], Awaitable[bool]]
+CompleteHook = Callable[[PipelineJob, PipelineResult], Awaitable[None]]
+PostProcess = Callable[[PipelineJob, PipelineResult], Awaitable[None]]
+
+
+def _timed_out(task_id: str, timeout: float) -> TaskResult:
+    return TaskResult(task_id=task_id, status=2, result=f"Timeout after {timeout}s")
+
+
+class GenerationPipeline:
+    """Run many generations through concurrent, independently sized stages.
+
+    Args:
+        client: ACE-Step client (one server).
+        max_inflight: Max tasks submitted but not yet finished on the server.
+        submit_concurrency: Parallel /release_task calls.
+        poll_interval: Seconds between poll rounds.
+        poll_batch: Task ids per query_result call.
+        download_concurrency: Parallel audio downloads.
+        postprocess_concurrency: Parallel post-processing workers.
+        queue_size: Capacity of each inter-stage queue.
+        timeout: Max seconds a task may take once every task submitted before it
+            has left the server. If polls fail for this long, every in-flight
+            task fails.
+        resubmit_lost: Resubmit tasks the server no longer reports.
+        storage: Tiered storage to register downloads with (after post-processing).
+        on_submitted: Awaited after each successful submission.
+        on_submit_failed: Awaited when a submission fails. Return True to take
+            the job back (e.g. to run it elsewhere); no result is reported for it.
+        on_finished: Awaited when the server reports a task done (before download).
+        postprocess: Awaited for each downloaded track (hashing, fingerprinting…).
+        tuner: Endpoint capacity tuner; caps in-flight tasks at its concurrency,
+            sets the batch size of new submissions, and learns from finished tasks.
+        scheduler: Submission scheduler for the endpoint; each in-flight task
+            holds one of its slots at ``priority``.
+        priority: Lane to take scheduler slots from.
+    """
+
+    def __init__(
+        self,
+        client: AceStepClient,
+        max_inflight: int = 16,
+        submit_concurrency: int = 2,
+        poll_interval: float = 2.0,
+        poll_batch: int = 100,
+        download_concurrency: int = 4,
+        postprocess_concurrency: int = 2,
+        queue_size: int = 64,
+        timeout: float = 300.0,
+        resubmit_lost: bool = True,
+        storage: TrackStorage | None = None,
+        on_submitted: SubmitHook | None = None,
+        on_submit_failed: SubmitFailedHook | None = None,
+        on_finished: CompleteHook | None = None,
+        postprocess: PostProcess | None = None,
+        tuner: EndpointTuner | None = None,
+        scheduler: SubmissionScheduler | None = None,
+        priority: Priority = Priority.BATCH,
+    ) -> None:
+        self.client = client
+        self.max_inflight = max_inflight
+        self.submit_concurrency = submit_concurrency
+        self.poll_interval = poll_interval
+        self.poll_batch = poll_batch
+        self.download_concurrency = download_concurrency
+        self.postprocess_concurrency = postprocess_concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.resubmit_lost = resubmit_lost
+        self.storage = storage
+        self.on_submitted = on_submitted
+        self.on_submit_failed = on_submit_failed
+        self.on_finished = on_finished
+        self.postprocess = postprocess
+        self.tuner = tuner
+        self.scheduler = scheduler
+        self.priority = priority
+
+    def _inflight_limit(self) -> int:
+        if self.tuner is None:
+            return self.max_inflight
+        return max(1, min(self.max_inflight, self.tuner.concurrency))
+
+    async def run(
+        self, jobs: Iterable[PipelineJob] | AsyncIterable[PipelineJob]
+    ) -> AsyncIterator[PipelineResult]:
+        """Feed jobs through the pipeline, yielding results as they finish."""
+        submit_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        download_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        post_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        results_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+
+        inflight: dict[str, _Item] = {}  # In submission order
+        resubmits: set[asyncio.Task] = set()
+        slots = _Gate(self._inflight_limit)
+        holding: dict[int, Slot] = {}  # Scheduler slots by id(item)
+        fed = False
+        pending = 0
+
+        async def take_slot() -> Slot | None:
+            await slots.acquire()
+            if self.scheduler is None:
+                return None
+            try:
+                return await self.scheduler.acquire(self.priority)
+            except BaseException:
+                slots.release()
+                raise
+
+        def release(slot: Slot | None) -> None:
+            slots.release()
+            if slot is not None:
+                self.scheduler.release(slot)
+
+        def free_slot(item: _Item) -> None:
+            release(holding.pop(id(item), None))
+
+        async def enqueue(item: _Item, slot: Slot | None) -> None:
+            if slot is not None:
+                holding[id(item)] = slot
+            await submit_q.put(item)
+
+        async def finish(item: _Item) -> None:
+            await results_q.put(item.result)
+
+        async def fail(item: _Item, error: str) -> None:
+            item.result.status = "failed"
+            item.result.error = error
+            await finish(item)
+
+        async def feed() -> None:
+            # A job is pulled only once a slot is free for it, so pipelines
+            # sharing one job source split it by how fast each finishes tasks
+            nonlocal fed, pending
+            source = aiter(jobs) if isinstance(jobs, AsyncIterable) else iter(jobs)
+            while True:
+                slot = await take_slot()
+                try:
+                    if isinstance(source, AsyncIterator):
+                        job = await anext(source, None)
+                    else:
+                        job = next(source, None)
+                except BaseException:
+                    release(slot)
+                    raise
+                if job is None:
+                    release(slot)
+                    break
+                pending += 1
+                await enqueue(_Item(job, PipelineResult(job.key)), slot)
+            fed = True
+
+        async def resubmit(item: _Item) -> None:
+            await enqueue(item, await take_slot())
+
+        async def submitter() -> None:
+            while True:
+                item = await submit_q.get()
+                job, result = item.job, item.result
+                try:
+                    if job.task_id:
+                        result.task_id = job.task_id
+                    else:
+                        params = self.tuner.apply(job.params) if self.tuner else job.params
+                        result.task_id = await self.client.generate(params)
+                        if self.on_submitted:
+                            await self.on_submitted(job, result.task_id)
+                except Exception as e:
+                    free_slot(item)
+                    log.warning("Submit failed for %s: %s", job.key, e)
+                    if self.on_submit_failed and await self.on_submit_failed(job, e):
+                        # Taken back by the caller: settle it without a result
+                        await results_q.put(None)
+                        continue
+                    await fail(item, f"Submit failed: {e}")
+                    continue
+                result.submitted_at = time.monotonic()
+                inflight[result.task_id] = item
+
+        async def poller() -> None:
+            last_polled = time.monotonic()
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                if not inflight:
+                    last_polled = time.monotonic()
+                    continue
+                task_ids = list(inflight)
+                finished: list[tuple[_Item, TaskResult]] = []
+                lost: list[_Item] = []
+                for start in range(0, len(task_ids), self.poll_batch):
+                    batch = task_ids[start : start + self.poll_batch]
+                    try:
+                        polled = await self.client.poll_results(batch)
+                    except Exception as e:
+                        log.warning("Poll failed: %s", e)
+                        polled = None
+                    now = time.monotonic()
+                    if polled is not None:
+                        last_polled = now
+                    # With the server unreachable for a whole timeout, give up on everything
+                    unreachable = now - last_polled > self.timeout
+                    by_id = {r.task_id: r for r in polled or []}
+                    for task_id in batch:
+                        item = inflight[task_id]
+                        polled_task = by_id.get(task_id)
+                        gone = polled is not None and polled_task is None
+                        done = polled_task is not None and polled_task.status in (1, 2)
+                        if item.abandoned_at is not None:
+                            # Already failed; hold its slot until the server lets go of it
+                            if not (gone or done or unreachable):
+                                continue
+                        elif gone:
+                            lost.append(item)
+                        elif done:
+                            finished.append((item, polled_task))
+                        elif unreachable:
+                            finished.append((item, _timed_out(task_id, self.timeout)))
+                        else:
+                            continue
+                        del inflight[task_id]
+                        # Free server capacity before anything downstream can block
+                        free_slot(item)
+
+                # Only our oldest task on the server is running (or next to run): time that one
+                head = next(iter(inflight.values()), None)
+                if head is not None:
+                    now = time.monotonic()
+                    if head.started_at is None:
+                        head.started_at = now
+                    elif head.abandoned_at is None and now - head.started_at > self.timeout:
+                        log.warning("Task %s for %s timed out", head.result.task_id, head.job.key)
+                        head.abandoned_at = now
+                        finished.append((head, _timed_out(head.result.task_id, self.timeout)))
+                    elif head.abandoned_at is not None and now - head.abandoned_at > self.timeout:
+                        # Still not done after twice the timeout: the server is stuck on it
+                        log.warning("Giving up on task %s", head.result.task_id)
+                        del inflight[head.result.task_id]
+                        free_slot(head)
+
+                for item in lost:
+                    if self.resubmit_lost:
+                        log.warning(
+                            "Task %s for %s lost, resubmitting", item.result.task_id, item.job.key
+                        )
+                        item.job.task_id = ""
+                        item.started_at = None
+                        task = asyncio.create_task(resubmit(item))
+                        resubmits.add(task)
+                        task.add_done_callback(resubmits.discard)
+                    else:
+                        await fail(item, "Task lost on ACE-Step server")
+
+                for item, polled_task in finished:
+                    item.result.finished_at = time.monotonic()
+                    if not item.job.task_id:
+                        # Queue wait plus generation on the server, as seen by our polls
+                        tracing.record(
+                            "ace.wait", item.result.submitted_at, item.result.finished_at,
+                            task_id=item.result.task_id, status=polled_task.status,
+                        )
+                    item.audio_paths = polled_task.audio_paths if polled_task.status == 1 else []
+                    if self.tuner is not None and not item.job.task_id:
+                        # Resumed tasks have no submit time to measure from
+                        self.tuner.observe(
+                            bool(item.audio_paths),
+                            tracks=len(item.audio_paths),
+                            latency=item.result.finished_at - item.result.submitted_at,
+                        )
+                    if polled_task.status == 2:
+                        await fail(item, polled_task.result)
+                        continue
+                    item.result.audio_path = polled_task.result
+                    if self.on_finished:
+                        await self.on_finished(item.job, item.result)
+                    await download_q.put(item)
+
+        async def downloader() -> None:
+            while True:
+                item = await download_q.get()
+                output = item.job.output_path
+                try:
+                    audio_paths = item.audio_paths or [item.result.audio_path]
+                    with tracing.bind_task(item.result.task_id):
+                        for i, audio_path in enumerate(audio_paths):
+                            target = output if i == 0 else output.with_name(
+                                f"{output.stem}-{i + 1}{output.suffix}"
+                            )
+                            item.result.paths.append(
+                                await self.client.download_audio(audio_path, target)
+                            )
+                    item.result.path = item.result.paths[0]
+                except Exception as e:
+                    log.warning("Download failed for %s: %s", item.job.key, e)
+                    await fail(item, f"Download failed: {e}")
+                    continue
+                item.result.downloaded_at = time.monotonic()
+                await post_q.put(item)
+
+        async def post_processor() -> None:
+            while True:
+                item = await post_q.get()
+                try:
+                    with tracing.bind_task(item.result.task_id), tracing.span("postprocess"):
+                        if self.postprocess:
+                            await self.postprocess(item.job, item.result)
+                        if self.storage is not None:
+                            for path in item.result.paths:
+                                await self.storage.add(path)
+                except Exception as e:
+                    log.warning("Post-processing failed for %s: %s", item.job.key, e)
+                    await fail(item, f"Post-processing failed: {e}")
+                    continue
+                item.result.status = "completed"
+                await finish(item)
+
+        workers = [asyncio.create_task(feed()), asyncio.create_task(poller())]
+        workers += [asyncio.create_task(submitter()) for _ in range(self.submit_concurrency)]
+        workers += [asyncio.create_task(downloader()) for _ in range(self.download_concurrency)]
+        workers += [
+            asyncio.create_task(post_processor()) for _ in range(self.postprocess_concurrency)
+        ]
+
+        try:
+            while not (fed and pending == 0):
+                get = asyncio.ensure_future(results_q.get())
+                running = [w for w in workers if not w.done()]
+                done, _ = await asyncio.wait([get, *running], return_when=asyncio.FIRST_COMPLETED)
+                for worker in done - {get}:
+                    # Only the feeder may finish; anything else is a bug worth surfacing
+                    if worker.exception() is not None:
+                        get.cancel()
+                        raise worker.exception()
+                if get in done:
+                    pending -= 1
+                    if get.result() is not None:
+                        yield get.result()
+                else:
+                    get.cancel()
+        finally:
+            for task in (*workers, *resubmits):
+                task.cancel()
+            await asyncio.gather(*workers, *resubmits, return_exceptions=True)
+            # Tasks abandoned mid-flight must not hold a shared scheduler's slots
+            for slot in holding.values():
+                self.scheduler.release(slot)
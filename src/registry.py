@@ -0,0 +1,172 @@
+"""Memory-compact registry of batch jobs and their in-flight state.
+
+A 15,000-track run must not keep a GenerationParams model, a TaskResult and
+a dataclass per job alive on a small orchestrator VM. The registry stores
+only what tracking needs — job key, state, task id, endpoint and
+timestamps — in parallel columns: ``array`` columns for the numbers, plain
+lists for the strings. The full params stay in the jobs manifest and are
+read back by byte offset only when a job is about to be submitted.
+
+Per job that is a few dozen bytes plus the two strings, instead of a
+couple of kilobytes of model objects.
+
+Usage:
+    registry = TaskRegistry()
+    row = registry.add("17", offset=1024)
+    registry.update(row, "submitted", task_id="...", endpoint="http://gpu-1:8001")
+    record = registry.get("17")
+    print(record.state, record.task_id, record.submitted_at)
+"""
+
+from __future__ import annotations
+
+import time
+from array import array
+from typing import Iterator
+
+STATES = ("pending", "submitted", "completed", "downloaded", "failed")
+_STATE_CODES = {state: code for code, state in enumerate(STATES)}
+_NO_ENDPOINT = 0xFFFF
+
+
+class TaskRecord:
+    """Read-only view of one registry row."""
+
+    __slots__ = ("_registry", "row")
+
+    def __init__(self, registry: TaskRegistry, row: int) -> None:
+        self._registry = registry
+        self.row = row
+
+    def __repr__(self) -> str:
+        return f"TaskRecord({self.key!r}, state={self.state!r}, task_id={self.task_id!r})"
+
+    @property
+    def key(self) -> str:
+        return self._registry._keys[self.row]
+
+    @property
+    def state(self) -> str:
+        return STATES[self._registry._states[self.row]]
+
+    @property
+    def task_id(self) -> str:
+        return self._registry._task_ids[self.row]
+
+    @property
+    def endpoint(self) -> str:
+        index = self._registry._endpoints[self.row]
+        return "" if index == _NO_ENDPOINT else self._registry.endpoints[index]
+
+    @property
+    def offset(self) -> int:
+        """Byte offset of the job in its manifest (-1 if not from a manifest)."""
+        return self._registry._offsets[self.row]
+
+    @property
+    def submitted_at(self) -> float:
+        return self._registry._submitted_at[self.row]
+
+    @property
+    def updated_at(self) -> float:
+        return self._registry._updated_at[self.row]
+
+    @property
+    def error(self) -> str:
+        return self._registry._errors.get(self.row, "")
+
+
+class TaskRegistry:
+    """Column-oriented table of jobs: key, state, task id, endpoint, timestamps.
+
+    Rows are append-only and addressed by integer row number; ``row(key)``
+    looks one up by job key. Errors are kept sparsely, for failed rows only.
+    """
+
+    def __init__(self) -> None:
+        self.endpoints: list[str] = []
+        self._endpoint_index: dict[str, int] = {}
+        self._index: dict[str, int] = {}
+        self._keys: list[str] = []
+        self._task_ids: list[str] = []
+        self._states = array("B")
+        self._endpoints = array("H")
+        self._offsets = array("q")
+        self._submitted_at = array("d")
+        self._updated_at = array("d")
+        self._errors: dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def add(self, key: str, offset: int = -1) -> int:
+        """Register a pending job. Returns its row. Keys must be unique."""
+        if key in self._index:
+            raise ValueError(f"Duplicate job id: {key}")
+        row = len(self._keys)
+        self._index[key] = row
+        self._keys.append(key)
+        self._task_ids.append("")
+        self._states.append(0)
+        self._endpoints.append(_NO_ENDPOINT)
+        self._offsets.append(offset)
+        self._submitted_at.append(0.0)
+        self._updated_at.append(0.0)
+        return row
+
+    def row(self, key: str) -> int | None:
+        return self._index.get(key)
+
+    def get(self, key: str) -> TaskRecord | None:
+        row = self._index.get(key)
+        return None if row is None else TaskRecord(self, row)
+
+    def _endpoint_code(self, endpoint: str) -> int:
+        code = self._endpoint_index.get(endpoint)
+        if code is None:
+            code = len(self.endpoints)
+            if code >= _NO_ENDPOINT:
+                raise ValueError("Too many distinct endpoints")
+            self.endpoints.append(endpoint)
+            self._endpoint_index[endpoint] = code
+        return code
+
+    def update(
+        self,
+        row: int,
+        state: str,
+        task_id: str | None = None,
+        endpoint: str | None = None,
+        error: str = "",
+        at: float | None = None,
+    ) -> None:
+        """Move a row to ``state``; a new submission also records task and endpoint."""
+        at = time.time() if at is None else at
+        self._states[row] = _STATE_CODES[state]
+        self._updated_at[row] = at
+        if task_id is not None:
+            self._task_ids[row] = task_id
+        if endpoint is not None:
+            self._endpoints[row] = self._endpoint_code(endpoint)
+        if state == "submitted":
+            self._submitted_at[row] = at
+            self._errors.pop(row, None)
+        elif state == "failed" and error:
+            self._errors[row] = error
+
+    def records(self, *states: str) -> Iterator[TaskRecord]:
+        """Rows in insertion order, optionally only those in ``states``."""
+        codes = {_STATE_CODES[state] for state in states}
+        for row, code in enumerate(self._states):
+            if not codes or code in codes:
+                yield TaskRecord(self, row)
+
+    def counts(self) -> dict[str, int]:
+        """Number of rows per state."""
+        counts = dict.fromkeys(STATES, 0)
+        for code in self._states:
+            counts[STATES[code]] += 1
+        return counts
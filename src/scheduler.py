@@ -0,0 +1,171 @@
+"""Priority scheduling of submissions to a shared ACE-Step server.
+
+ACE-Step runs a single FIFO queue per server, so anything we submit waits
+behind everything submitted before it. To keep interactive requests fast
+while bulk work is running, we cap how many tasks are outstanding on the
+server and hand out those slots by priority:
+
+- INTERACTIVE submissions may use every slot and always go to the front of
+  the local wait queue.
+- BATCH submissions may use all but ``interactive_reserve`` slots, so there
+  is always room for a person at the /generate form.
+
+A slot is held from submission until the server reports the task finished.
+The web app submits through the scheduler directly; bulk runs
+(BatchRunner, via GenerationPipeline) take BATCH slots from it too. When a
+batch run is its own process, its scheduler still caps the run at
+``max_inflight - interactive_reserve`` tasks on the server, so a person at
+/generate waits behind at most that many in ACE-Step's FIFO queue.
+Rate limiting happens before a request gets here, in the web layer's
+admission controller (src/web/admission.py).
+
+Usage:
+    scheduler = get_scheduler(settings.acestep_api_url)
+    slot = await scheduler.acquire(Priority.INTERACTIVE)
+    try:
+        task_id = await client.generate(params)
+        await client.wait_for_completion(task_id)
+    finally:
+        scheduler.release(slot)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+from src.config import get_settings
+
+
+class Priority(IntEnum):
+    """Submission classes. Lower values are served first."""
+
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+@dataclass
+class Slot:
+    """A reserved unit of server capacity. Release exactly once."""
+
+    priority: Priority
+    released: bool = False
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    future: asyncio.Future[Slot] = field(compare=False)
+
+
+class SubmissionScheduler:
+    """Hands out server slots by priority.
+
+    Args:
+        max_inflight: Max tasks outstanding on the server from this process.
+        interactive_reserve: Slots batch work may never take.
+    """
+
+    def __init__(self, max_inflight: int = 16, interactive_reserve: int = 4) -> None:
+        if not 0 <= interactive_reserve < max_inflight:
+            raise ValueError("interactive_reserve must be in [0, max_inflight)")
+        self.max_inflight = max_inflight
+        self.interactive_reserve = interactive_reserve
+
+        self._inflight = 0
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for w in self._waiters if not w.future.done())
+
+    def _limit(self, priority: Priority) -> int:
+        if priority == Priority.INTERACTIVE:
+            return self.max_inflight
+        return self.max_inflight - self.interactive_reserve
+
+    def try_acquire(self, priority: Priority = Priority.BATCH) -> Slot | None:
+        """Take a slot if one is free; None otherwise.
+
+        Defers to anyone already waiting at the same or a higher priority, but
+        not to lower-priority waiters: interactive requests may take the
+        reserved slots that waiting batch work cannot use.
+        """
+        if self._inflight < self._limit(priority) and not any(
+            w.priority <= priority and not w.future.done() for w in self._waiters
+        ):
+            self._inflight += 1
+            return Slot(priority)
+        return None
+
+    async def acquire(self, priority: Priority = Priority.BATCH) -> Slot:
+        """Wait for a server slot."""
+        slot = self.try_acquire(priority)
+        if slot is not None:
+            return slot
+
+        future: asyncio.Future[Slot] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, _Waiter(int(priority), next(self._seq), future))
+        self._dispatch()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(future.result())
+            raise
+
+    def release(self, slot: Slot) -> None:
+        """Return a slot and wake the highest-priority waiter that fits."""
+        if slot.released:
+            return
+        slot.released = True
+        self._inflight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._waiters:
+            head = self._waiters[0]
+            if head.future.done():
+                heapq.heappop(self._waiters)
+                continue
+            priority = Priority(head.priority)
+            if self._inflight >= self._limit(priority):
+                # Strict priority: batch never overtakes a waiting interactive request
+                return
+            heapq.heappop(self._waiters)
+            self._inflight += 1
+            head.future.set_result(Slot(priority))
+
+
+_schedulers: dict[str, SubmissionScheduler] = {}
+
+
+def get_scheduler(
+    endpoint: str, max_inflight: int | None = None, interactive_reserve: int | None = None
+) -> SubmissionScheduler:
+    """Return the process-wide scheduler for an ACE-Step endpoint.
+
+    ``max_inflight`` and ``interactive_reserve`` override the settings, but
+    only when this call creates the scheduler.
+    """
+    scheduler = _schedulers.get(endpoint)
+    if scheduler is None:
+        settings = get_settings()
+        scheduler = SubmissionScheduler(
+            max_inflight=max_inflight or settings.scheduler_max_inflight,
+            interactive_reserve=(
+                settings.scheduler_interactive_reserve
+                if interactive_reserve is None else interactive_reserve
+            ),
+        )
+        _schedulers[endpoint] = scheduler
+    return scheduler
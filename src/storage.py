@@ -0,0 +1,348 @@
+"""Tiered audio storage: size-bounded hot local cache plus a cold archive.
+
+The hot tier is ``Settings.output_dir``. Every file added to it is copied
+through to the cold tier first, and only files confirmed to be in the cold
+tier are ever evicted, so dropping the least recently used hot files never
+loses a track — it is fetched back on demand. Files that were already in the
+hot directory (e.g. when a cold tier is enabled for an existing library) are
+uploaded at the point they would be evicted; if that upload fails they stay
+hot.
+
+Cold tiers:
+    ""                       No cold tier; the hot directory is never evicted.
+    "/mnt/archive"           Local archive directory (also "file:///mnt/archive").
+    "s3://bucket/prefix"     S3-compatible object store (AWS, MinIO). Requires boto3.
+
+Usage:
+    from src.storage import get_storage
+
+    storage = get_storage()
+    path = storage.path_for("abc123.mp3")   # write the download here
+    await storage.add(path)                 # archive + account + evict
+    path = await storage.fetch("abc123.mp3")  # hot hit, or restore from cold
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import shutil
+from collections import OrderedDict
+from pathlib import Path
+from typing import Protocol
+from urllib.parse import urlparse
+
+from src.config import Settings, get_settings
+
+log = logging.getLogger(__name__)
+
+
+class ColdTier(Protocol):
+    """Blocking interface implemented by cold storage backends."""
+
+    def put(self, key: str, src: Path) -> None: ...
+
+    def get(self, key: str, dest: Path) -> bool: ...
+
+    def delete(self, key: str) -> None: ...
+
+
+class LocalArchiveTier:
+    """Cold tier backed by a local (or network-mounted) directory."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def put(self, key: str, src: Path) -> None:
+        dest = self.root / key
+        tmp = dest.with_name(dest.name + ".part")
+        shutil.copyfile(src, tmp)
+        tmp.replace(dest)
+
+    def get(self, key: str, dest: Path) -> bool:
+        src = self.root / key
+        if not src.exists():
+            return False
+        shutil.copyfile(src, dest)
+        return True
+
+    def delete(self, key: str) -> None:
+        (self.root / key).unlink(missing_ok=True)
+
+
+class S3Tier:
+    """Cold tier backed by an S3-compatible object store (AWS S3, MinIO)."""
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: str = "",
+        access_key_id: str = "",
+        secret_access_key: str = "",
+        region: str = "",
+    ) -> None:
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError(
+                "S3 cold storage requires boto3: pip install 'ace-music[s3]'"
+            ) from e
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self._s3 = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+            region_name=region or None,
+        )
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put(self, key: str, src: Path) -> None:
+        self._s3.upload_file(str(src), self.bucket, self._object_key(key))
+
+    def get(self, key: str, dest: Path) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self._s3.download_file(self.bucket, self._object_key(key), str(dest))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return False
+            raise
+        return True
+
+    def delete(self, key: str) -> None:
+        self._s3.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+
+def cold_tier_from_settings(settings: Settings) -> ColdTier | None:
+    """Build the cold tier described by ``settings.cold_storage_url``, if any."""
+    url = settings.cold_storage_url.strip()
+    if not url:
+        return None
+
+    parsed = urlparse(url)
+    if parsed.scheme == "s3":
+        return S3Tier(
+            bucket=parsed.netloc,
+            prefix=parsed.path,
+            endpoint_url=settings.s3_endpoint_url,
+            access_key_id=settings.s3_access_key_id,
+            secret_access_key=settings.s3_secret_access_key,
+            region=settings.s3_region,
+        )
+    if parsed.scheme == "file":
+        return LocalArchiveTier(Path(parsed.path))
+    if parsed.scheme == "":
+        return LocalArchiveTier(Path(url))
+    raise ValueError(f"Unsupported cold storage URL: {url}")
+
+
+class TrackStorage:
+    """Hot local cache with LRU eviction, backed by an optional cold tier.
+
+    Recency is tracked in memory and mirrored to file mtimes, so the LRU
+    order survives restarts. Keys copied to the cold tier in this process are
+    remembered; any other file is archived before it is evicted. Blocking
+    file and network I/O runs in worker threads to keep the event loop
+    responsive, and cold-tier transfers run without the index lock held, so
+    hot hits never wait behind a slow restore or upload.
+    """
+
+    def __init__(
+        self,
+        hot_dir: Path,
+        max_bytes: int = 0,
+        cold: ColdTier | None = None,
+    ) -> None:
+        self.hot_dir = hot_dir
+        self.max_bytes = max_bytes
+        self.cold = cold
+        self.hot_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = asyncio.Lock()
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._archived: set[str] = set()
+        self._restoring: dict[str, asyncio.Task[Path | None]] = {}
+        self._pinned: set[str] = set()  # Being added or restored; never evicted
+        self._evicting = False
+        self._used = 0
+        self._scan()
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> TrackStorage:
+        return cls(
+            hot_dir=Path(settings.output_dir),
+            max_bytes=settings.hot_cache_max_mb * 1024 * 1024,
+            cold=cold_tier_from_settings(settings),
+        )
+
+    @property
+    def used_bytes(self) -> int:
+        """Bytes currently held in the hot tier."""
+        return self._used
+
+    def _scan(self) -> None:
+        """Index existing hot files, least recently used first."""
+        files = [p for p in self.hot_dir.iterdir() if p.is_file() and not p.name.endswith(".part")]
+        files.sort(key=lambda p: p.stat().st_mtime)
+        for path in files:
+            size = path.stat().st_size
+            self._entries[path.name] = size
+            self._used += size
+
+    def path_for(self, key: str) -> Path:
+        """Hot-tier path for a storage key (the audio filename)."""
+        return self.hot_dir / key
+
+    async def add(self, path: Path) -> Path:
+        """Register a file just written to the hot tier.
+
+        Copies it to the cold tier (write-through), then evicts least
+        recently used files until the hot tier is back under budget. If the
+        copy fails the file stays hot until a later eviction archives it.
+        """
+        key = path.name
+        self._pinned.add(key)
+        try:
+            if self.cold is not None:
+                await self._archive(key, path)
+            async with self._lock:
+                self._track(key, path.stat().st_size)
+            await self._evict()
+        finally:
+            self._pinned.discard(key)
+        return path
+
+    async def fetch(self, key: str) -> Path | None:
+        """Return a hot path for ``key``, restoring it from cold if needed.
+
+        Concurrent fetches of the same cold key share one restore. Returns
+        None if the track exists in neither tier.
+        """
+        path = self.path_for(key)
+        async with self._lock:
+            hit = key in self._entries and path.exists()
+            if hit:
+                self._entries.move_to_end(key)
+        if hit:
+            await asyncio.to_thread(os.utime, path)
+            return path
+
+        if self.cold is None:
+            return path if path.exists() else None
+
+        restore = self._restoring.get(key)
+        if restore is None:
+            restore = asyncio.create_task(self._restore(key))
+            self._restoring[key] = restore
+            restore.add_done_callback(lambda _: self._restoring.pop(key, None))
+        # One caller giving up must not cancel the restore for the others
+        return await asyncio.shield(restore)
+
+    async def _restore(self, key: str) -> Path | None:
+        path = self.path_for(key)
+        tmp = path.with_name(path.name + ".part")
+        self._pinned.add(key)
+        try:
+            found = await asyncio.to_thread(self.cold.get, key, tmp)
+            if not found:
+                return None
+            async with self._lock:
+                tmp.replace(path)
+                self._archived.add(key)
+                self._track(key, path.stat().st_size)
+            log.info("Restored %s from cold storage", key)
+            await self._evict()
+        finally:
+            self._pinned.discard(key)
+        return path
+
+    async def delete(self, key: str) -> None:
+        """Remove a track from both tiers."""
+        async with self._lock:
+            size = self._entries.pop(key, None)
+            if size is not None:
+                self._used -= size
+            self._archived.discard(key)
+            self.path_for(key).unlink(missing_ok=True)
+        if self.cold is not None:
+            await asyncio.to_thread(self.cold.delete, key)
+
+    def _track(self, key: str, size: int) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._used -= old
+        self._entries[key] = size
+        self._used += size
+
+    async def _archive(self, key: str, path: Path) -> bool:
+        """Copy a hot file to the cold tier. Returns False (and logs) on failure."""
+        try:
+            await asyncio.to_thread(self.cold.put, key, path)
+        except Exception as e:
+            log.warning("Could not archive %s to cold storage: %s", key, e)
+            self._archived.discard(key)
+            return False
+        self._archived.add(key)
+        return True
+
+    async def _evict(self) -> None:
+        """Drop LRU hot files over budget. Only runs when a cold tier exists.
+
+        A file is deleted only once it is known to be in the cold tier; files
+        that were never archived (found by the startup scan, or whose
+        write-through failed) are uploaded first and kept if that fails.
+        Uploads run without the lock, so one pass runs at a time and keeps
+        going until the hot tier is under budget.
+        """
+        if self.cold is None or self.max_bytes <= 0 or self._evicting:
+            return
+        self._evicting = True
+        skipped: set[str] = set()
+        try:
+            while True:
+                async with self._lock:
+                    key = self._eviction_candidate(skipped)
+                if key is None:
+                    return
+                path = self.path_for(key)
+                if key not in self._archived and not await self._archive(key, path):
+                    skipped.add(key)
+                    continue
+                async with self._lock:
+                    if key != self._eviction_candidate(skipped):
+                        # Used (or deleted) while it was uploading: pick again
+                        continue
+                    size = self._entries.pop(key)
+                    self._used -= size
+                    await asyncio.to_thread(path.unlink, missing_ok=True)
+                log.debug("Evicted %s from hot cache (%d bytes)", key, size)
+        finally:
+            self._evicting = False
+
+    def _eviction_candidate(self, skipped: set[str]) -> str | None:
+        """The least recently used evictable key, or None once under budget."""
+        if self._used <= self.max_bytes:
+            return None
+        return next(
+            (key for key in self._entries if key not in self._pinned and key not in skipped), None
+        )
+
+
+_storage: TrackStorage | None = None
+
+
+def get_storage() -> TrackStorage:
+    """Return the process-wide TrackStorage, creating it on first use."""
+    global _storage
+    if _storage is None:
+        _storage = TrackStorage.from_settings(get_settings())
+    return _storage
@@ -0,0 +1,296 @@
+"""Lightweight OpenTelemetry-style spans for each track's lifecycle.
+
+Every step a track goes through — submit, each poll, the server-side wait,
+download, post-processing and each database/checkpoint write — can be
+recorded as a span with a start and end time. Spans carry the ACE-Step
+``task_id`` as an attribute, and a span whose task is known gets a trace id
+derived from it, so all spans of one track share a trace even when they
+come from different processes (web app, batch runner, reconciliation).
+
+Tracing is off unless an exporter is configured:
+
+- ``TRACE_FILE=traces.jsonl`` appends one JSON object per span.
+- ``TRACE_OTLP_ENDPOINT=http://localhost:4318/v1/traces`` ships spans in
+  OTLP/JSON to a local OpenTelemetry collector (Jaeger, Tempo, ...).
+
+When off, ``span()`` costs one attribute check. ``scripts/trace-summary.py``
+turns a trace file into a per-stage critical-path report.
+
+Usage:
+    with tracing.bind_task(task_id):
+        with tracing.span("db.update", op="completed"):
+            ...
+"""
+
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Protocol
+
+log = logging.getLogger(__name__)
+
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar(
+    "current_span", default=None
+)
+_current_task: contextvars.ContextVar[str] = contextvars.ContextVar("current_task", default="")
+
+
+class Span:
+    """One timed operation. Times are Unix epoch nanoseconds."""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error",
+    )
+
+    def __init__(self, name: str, parent: Span | None = None, **attributes: Any) -> None:
+        self.name = name
+        self.trace_id = parent.trace_id if parent else ""
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else ""
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error = ""
+
+    def set(self, key: str, value: Any) -> None:
+        """Set an attribute (e.g. the task_id once the server assigns it)."""
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": "ERROR", "message": self.error} if self.error else {"code": "OK"},
+        }
+
+
+def trace_id_for(task_id: str) -> str:
+    """Deterministic 128-bit trace id for an ACE-Step task."""
+    return hashlib.md5(task_id.encode()).hexdigest()
+
+
+class Exporter(Protocol):
+    def export(self, span: Span) -> None: ...
+
+    def shutdown(self) -> None: ...
+
+
+class JsonFileExporter:
+    """Append finished spans to a JSONL file."""
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = path.open("a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class OtlpHttpExporter:
+    """Ship spans to an OTLP/HTTP collector in JSON, batched from a worker thread."""
+
+    def __init__(
+        self,
+        endpoint: str,
+        service_name: str = "ace-music",
+        batch_size: int = 256,
+        flush_interval: float = 2.0,
+    ) -> None:
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue[Span | None] = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._worker, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass  # Never slow the app down for telemetry
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _worker(self) -> None:
+        import httpx
+
+        with httpx.Client(timeout=5.0) as client:
+            stopping = False
+            while not stopping:
+                batch: list[Span] = []
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                if batch:
+                    try:
+                        client.post(self.endpoint, json=self._payload(batch)).raise_for_status()
+                    except httpx.HTTPError as e:
+                        log.warning("Dropped %d spans: %s", len(batch), e)
+
+    def _payload(self, spans: list[Span]) -> dict[str, Any]:
+        def value(v: Any) -> dict[str, Any]:
+            if isinstance(v, bool):
+                return {"boolValue": v}
+            if isinstance(v, int):
+                return {"intValue": str(v)}
+            if isinstance(v, float):
+                return {"doubleValue": v}
+            if isinstance(v, (list, tuple)):
+                return {"arrayValue": {"values": [value(x) for x in v]}}
+            return {"stringValue": v if isinstance(v, str) else json.dumps(v, default=str)}
+
+        return {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": self.service_name}},
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": "ace-music"},
+                "spans": [{
+                    "traceId": s.trace_id,
+                    "spanId": s.span_id,
+                    "parentSpanId": s.parent_id,
+                    "name": s.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns),
+                    "attributes": [{"key": k, "value": value(v)} for k, v in s.attributes.items()],
+                    "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+                } for s in spans],
+            }],
+        }]}
+
+
+_exporters: list[Exporter] | None = None
+
+
+def configure(
+    file: str | Path = "", otlp_endpoint: str = "", service_name: str = "ace-music"
+) -> None:
+    """Set up exporters explicitly (replacing any from settings)."""
+    global _exporters
+    shutdown()
+    _exporters = []
+    if file:
+        _exporters.append(JsonFileExporter(Path(file)))
+    if otlp_endpoint:
+        _exporters.append(OtlpHttpExporter(otlp_endpoint, service_name))
+
+
+def _active_exporters() -> list[Exporter]:
+    if _exporters is None:
+        from src.config import get_settings
+
+        settings = get_settings()
+        configure(settings.trace_file, settings.trace_otlp_endpoint, settings.trace_service_name)
+    return _exporters
+
+
+def shutdown() -> None:
+    """Flush and close all exporters."""
+    global _exporters
+    for exporter in _exporters or []:
+        exporter.shutdown()
+    _exporters = None
+
+
+def _finish(span: Span) -> None:
+    span.end_ns = span.end_ns or time.time_ns()
+    task_id = span.attributes.get("task_id")
+    if not span.trace_id:
+        span.trace_id = trace_id_for(task_id) if task_id else os.urandom(16).hex()
+    for exporter in _active_exporters():
+        exporter.export(span)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """Time the enclosed block as a child of the current span.
+
+    Picks up the task bound with bind_task() as its ``task_id`` attribute.
+    Yields None when tracing is off.
+    """
+    if not _active_exporters():
+        yield None
+        return
+
+    parent = _current_span.get()
+    task_id = _current_task.get()
+    if task_id and "task_id" not in attributes:
+        attributes["task_id"] = task_id
+    current = Span(name, parent, **attributes)
+    if task_id and not parent:
+        current.trace_id = trace_id_for(task_id)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        _finish(current)
+
+
+def record(name: str, start: float, end: float, **attributes: Any) -> None:
+    """Emit a span for an interval measured with time.monotonic().
+
+    For stages no single block of code spans, such as a task's time on the
+    server between submission and the poll that saw it finish.
+    """
+    if not _active_exporters():
+        return
+    offset_ns = time.time_ns() - time.monotonic_ns()
+    task_id = attributes.get("task_id") or _current_task.get()
+    if task_id:
+        attributes["task_id"] = task_id
+    recorded = Span(name, None, **attributes)
+    recorded.start_ns = int(start * 1e9) + offset_ns
+    recorded.end_ns = int(end * 1e9) + offset_ns
+    _finish(recorded)
+
+
+def set_task(task_id: str) -> None:
+    """Attribute the rest of the current asyncio task's spans to an ACE-Step task."""
+    _current_task.set(task_id)
+
+
+@contextmanager
+def bind_task(task_id: str) -> Iterator[None]:
+    """Attribute spans opened inside the block to an ACE-Step task."""
+    token = _current_task.set(task_id)
+    try:
+        yield
+    finally:
+        _current_task.reset(token)
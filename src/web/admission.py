@@ -0,0 +1,204 @@
+"""Admission control for generation submissions.
+
+Every submission passes three checks before it may reach ACE-Step:
+
+1. A per-client token bucket, so one client cannot flood the server.
+2. A global token bucket, capping the total submission rate of this process.
+3. A bounded pending queue per priority lane: submissions admitted while
+   every scheduler slot is busy wait locally (the track shows as "queued").
+   When that queue is full, new submissions are rejected immediately.
+
+A bulk request (the JSON API) costs one token but takes one pending place
+per job, released job by job as each is submitted.
+
+Rejections raise RateLimitExceeded (or its QueueFull subclass) carrying a
+retry_after hint, which routes turn into a fast 429 with a Retry-After
+header. Under load, clients get an answer in milliseconds instead of
+queueing on the GPU until poll_timeout fails them.
+
+Usage:
+    admission = get_admission()
+    ticket = admission.admit(client="10.0.0.5")   # may raise RateLimitExceeded
+    try:
+        slot = await scheduler.acquire(priority)
+    finally:
+        admission.release(ticket)
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+
+from src.config import get_settings
+from src.scheduler import Priority
+
+# Suggested wait when the pending queue is full; slots free up as tasks finish
+QUEUE_FULL_RETRY_AFTER = 5.0
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a client, or the app as a whole, submits too fast."""
+
+    def __init__(self, retry_after: float, message: str = "") -> None:
+        super().__init__(message or f"Rate limit exceeded, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class QueueFull(RateLimitExceeded):
+    """Raised when too many admitted submissions are already waiting for a slot."""
+
+    def __init__(self, retry_after: float = QUEUE_FULL_RETRY_AFTER) -> None:
+        super().__init__(retry_after, f"Submission queue full, retry in {retry_after:.0f}s")
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available. Returns False (taking nothing) otherwise."""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def retry_after(self, tokens: float = 1.0) -> float:
+        """Seconds until ``tokens`` will be available."""
+        self._refill()
+        if self._tokens >= tokens or self.rate <= 0:
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    @property
+    def idle(self) -> bool:
+        """True once the bucket has refilled completely (safe to forget)."""
+        self._refill()
+        return self._tokens >= self.capacity
+
+
+@dataclass
+class Ticket:
+    """Pending-queue places held by an admitted request."""
+
+    client: str
+    priority: Priority
+    count: int = 1
+
+    @property
+    def released(self) -> bool:
+        return self.count == 0
+
+
+class AdmissionController:
+    """Global and per-client rate limits plus a bounded pending queue.
+
+    Args:
+        rate_per_minute: Sustained submissions per minute for the whole app (0 = unlimited).
+        burst: Submissions the app accepts back-to-back.
+        client_rate_per_minute: Sustained submissions per minute per client (0 = unlimited).
+        client_burst: Submissions a client may make back-to-back.
+        max_pending: Interactive submissions that may wait for a server slot at once.
+        max_pending_batch: Batch-priority jobs that may wait at once.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: float = 120.0,
+        burst: int = 20,
+        client_rate_per_minute: float = 10.0,
+        client_burst: int = 5,
+        max_pending: int = 32,
+        max_pending_batch: int = 10000,
+    ) -> None:
+        self.client_rate_per_minute = client_rate_per_minute
+        self.client_burst = client_burst
+        self.max_pending = {Priority.INTERACTIVE: max_pending, Priority.BATCH: max_pending_batch}
+
+        self._global = TokenBucket(rate_per_minute / 60.0, burst) if rate_per_minute > 0 else None
+        self._client_buckets: dict[str, TokenBucket] = {}
+        self._pending = {priority: 0 for priority in Priority}
+
+    @property
+    def pending(self) -> int:
+        return sum(self._pending.values())
+
+    def _client_bucket(self, client: str) -> TokenBucket | None:
+        if not client or self.client_rate_per_minute <= 0:
+            return None
+        bucket = self._client_buckets.get(client)
+        if bucket is None:
+            # Drop buckets that have fully refilled so the map stays small
+            if len(self._client_buckets) > 1024:
+                self._client_buckets = {
+                    k: b for k, b in self._client_buckets.items() if not b.idle
+                }
+            bucket = TokenBucket(self.client_rate_per_minute / 60.0, self.client_burst)
+            self._client_buckets[client] = bucket
+        return bucket
+
+    def admit(
+        self, client: str = "", count: int = 1, priority: Priority = Priority.INTERACTIVE
+    ) -> Ticket:
+        """Admit a request for ``count`` jobs or raise without consuming anything.
+
+        Raises QueueFull when the lane's pending queue has no room for all
+        of them, and RateLimitExceeded when the client's or the global bucket
+        is empty.
+        """
+        if self._pending[priority] + count > self.max_pending[priority]:
+            raise QueueFull()
+
+        buckets = [b for b in (self._client_bucket(client), self._global) if b is not None]
+        retry_after = max((b.retry_after() for b in buckets), default=0.0)
+        if retry_after > 0:
+            raise RateLimitExceeded(retry_after)
+        for bucket in buckets:
+            bucket.try_acquire()
+
+        self._pending[priority] += count
+        return Ticket(client, priority, count)
+
+    def hold(self, count: int, priority: Priority) -> Ticket:
+        """Take ``count`` pending places without any checks.
+
+        For jobs that were admitted before a restart and are queued again.
+        """
+        self._pending[priority] += count
+        return Ticket("", priority, count)
+
+    def release(self, ticket: Ticket, count: int | None = None) -> None:
+        """Give back ``count`` of a ticket's places (default: all it still holds)."""
+        count = ticket.count if count is None else min(count, ticket.count)
+        ticket.count -= count
+        self._pending[ticket.priority] -= count
+
+
+_admission: AdmissionController | None = None
+
+
+def get_admission() -> AdmissionController:
+    """Return the process-wide admission controller."""
+    global _admission
+    if _admission is None:
+        settings = get_settings()
+        _admission = AdmissionController(
+            rate_per_minute=settings.admission_rate_per_minute,
+            burst=settings.admission_burst,
+            client_rate_per_minute=settings.user_rate_limit_per_minute,
+            client_burst=settings.user_rate_limit_burst,
+            max_pending=settings.admission_max_pending,
+            max_pending_batch=settings.admission_max_pending_batch,
+        )
+    return _admission
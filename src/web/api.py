@@ -0,0 +1,150 @@
+"""JSON API for programmatic clients, under /api/v1.
+
+The HTMX routes in routes.py render HTML one track at a time. These
+endpoints take and return JSON and work in bulk, so a machine client can
+queue thousands of jobs and follow them with a handful of requests:
+
+    POST /api/v1/generations          {"jobs": [GenerationParams, ...]}
+    POST /api/v1/tracks/status        {"ids": [1, 2, 3]}
+    POST /api/v1/tracks/downloads     {"ids": [1, 2, 3]}
+
+Submissions go through the same admission control and scheduler as the
+web form, in the batch priority lane, so bulk work never crowds out people
+using /generate. Over-limit requests get 429 with a Retry-After header;
+a request with more jobs than the batch queue can ever hold gets 413.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, Field
+
+from src.ace_client import GenerationParams
+from src.web import database as db
+from src.scheduler import Priority
+from src.web.admission import QueueFull, RateLimitExceeded, get_admission
+from src.web.database import Track
+from src.web.export import track_download_name
+from src.web.generation import PENDING_TASK_PREFIX, submit_generations
+
+# Upper bound on ids per status/download request
+MAX_IDS = 10000
+
+router = APIRouter(prefix="/api/v1", tags=["api"])
+
+
+class SubmitRequest(BaseModel):
+    """Bulk submission: one GenerationParams per job."""
+
+    jobs: list[GenerationParams] = Field(min_length=1)
+
+
+class TrackIds(BaseModel):
+    """A list of track ids to look up."""
+
+    ids: list[int] = Field(min_length=1, max_length=MAX_IDS)
+
+
+class TrackStatus(BaseModel):
+    """Machine-readable state of one track."""
+
+    id: int
+    task_id: str | None
+    status: str
+    prompt: str
+    audio_duration: float
+    audio_format: str
+    generation_time: float | None = None
+    error_message: str | None = None
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_track(cls, track: Track) -> TrackStatus:
+        task_id = None if track.task_id.startswith(PENDING_TASK_PREFIX) else track.task_id
+        return cls(
+            id=track.id,
+            task_id=task_id,
+            status=track.status,
+            prompt=track.prompt,
+            audio_duration=track.audio_duration,
+            audio_format=track.audio_format,
+            generation_time=track.generation_time,
+            error_message=track.error_message,
+            created_at=track.created_at,
+            updated_at=track.updated_at,
+        )
+
+
+class StatusResponse(BaseModel):
+    tracks: list[TrackStatus]
+    missing: list[int] = []
+
+
+class DownloadLink(BaseModel):
+    id: int
+    url: str
+    filename: str
+    file_size: int | None = None
+
+
+class DownloadsResponse(BaseModel):
+    downloads: list[DownloadLink]
+    not_ready: list[int] = []
+    missing: list[int] = []
+
+
+async def _lookup(ids: list[int]) -> tuple[list[Track], list[int]]:
+    """Tracks for ids in request order (deduplicated), plus ids that do not exist."""
+    ids = list(dict.fromkeys(ids))
+    found = {track.id: track for track in await db.get_tracks_by_ids(ids)}
+    return [found[i] for i in ids if i in found], [i for i in ids if i not in found]
+
+
+@router.post("/generations", response_model=StatusResponse, status_code=202)
+async def submit_jobs(request: Request, body: SubmitRequest):
+    """Queue many generations in one request. Returns the queued tracks."""
+    user = request.client.host if request.client else ""
+    max_jobs = get_admission().max_pending[Priority.BATCH]
+    if len(body.jobs) > max_jobs:
+        # Retrying could never help, unlike a 429
+        raise HTTPException(status_code=413, detail=f"At most {max_jobs} jobs per request")
+    try:
+        tracks = await submit_generations(body.jobs, user=user)
+    except RateLimitExceeded as e:
+        detail = "Submission queue full" if isinstance(e, QueueFull) else "Rate limit exceeded"
+        raise HTTPException(
+            status_code=429,
+            detail=f"{detail}, retry in {e.retry_after:.0f}s",
+            headers={"Retry-After": str(int(e.retry_after) + 1)},
+        )
+    return StatusResponse(tracks=[TrackStatus.from_track(track) for track in tracks])
+
+
+@router.post("/tracks/status", response_model=StatusResponse)
+async def track_status(body: TrackIds):
+    """Current status of many tracks."""
+    tracks, missing = await _lookup(body.ids)
+    return StatusResponse(
+        tracks=[TrackStatus.from_track(track) for track in tracks], missing=missing
+    )
+
+
+@router.post("/tracks/downloads", response_model=DownloadsResponse)
+async def track_downloads(request: Request, body: TrackIds):
+    """Download URLs for completed tracks; others are listed as not ready."""
+    tracks, missing = await _lookup(body.ids)
+    response = DownloadsResponse(downloads=[], missing=missing)
+    for track in tracks:
+        if track.status != "completed" or not track.file_path:
+            response.not_ready.append(track.id)
+            continue
+        response.downloads.append(DownloadLink(
+            id=track.id,
+            url=str(request.url_for("api_download_track", track_id=track.id)),
+            filename=track_download_name(track),
+            file_size=track.file_size,
+        ))
+    return response
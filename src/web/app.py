@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from pathlib import Path
@@ -9,25 +10,35 @@ from pathlib import Path
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
+from src import tracing
 from src.config import get_settings
 from src.web.database import init_db, close_db
+from src.web.generation import reconcile_loop, reconcile_tracks
 
 log = logging.getLogger(__name__)
 
-settings = get_settings()
-
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize database on startup, cleanup on shutdown."""
+    settings = get_settings()
+
     # Ensure output directory exists
     Path(settings.output_dir).mkdir(parents=True, exist_ok=True)
     Path("data").mkdir(parents=True, exist_ok=True)
 
     await init_db()
     log.info("Database initialized: %s", settings.database_url)
+
+    # Repair tracks whose polling task died with a previous process
+    if settings.reconcile_interval > 0:
+        reconciler = asyncio.create_task(reconcile_loop(settings.reconcile_interval))
+    else:
+        reconciler = asyncio.create_task(reconcile_tracks())
     yield
+    reconciler.cancel()
     await close_db()
+    tracing.shutdown()
 
 
 app = FastAPI(
@@ -37,16 +48,15 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-# Ensure directories exist before mounting static files
-_audio_dir = Path(settings.output_dir)
-_audio_dir.mkdir(parents=True, exist_ok=True)
-app.mount("/audio", StaticFiles(directory=str(_audio_dir)), name="audio")
-
+# Audio under /audio is served by routes.py so evicted files can be restored
+# from cold storage on demand.
 _static_dir = Path(__file__).parent.parent / "templates" / "static"
 _static_dir.mkdir(parents=True, exist_ok=True)
 app.mount("/static", StaticFiles(directory=str(_static_dir)), name="static")
 
 # Import and include routes (after app is created)
+from src.web.api import router as api_router  # noqa: E402
 from src.web.routes import router  # noqa: E402
 
 app.include_router(router)
+app.include_router(api_router)
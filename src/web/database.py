@@ -4,13 +4,17 @@ from __future__ import annotations
 
 from datetime import datetime, timezone
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import AsyncGenerator, AsyncIterator
 
-from sqlalchemy import JSON, Float, Integer, String, Text, Boolean, DateTime, select
+from sqlalchemy import (
+    JSON, BigInteger, Boolean, DateTime, Float, ForeignKey, Integer, Select, String, Text,
+    delete, or_, select,
+)
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 from src.config import get_settings
+from src.fingerprint import NUM_BANDS, band_probes, bands, hamming
 
 
 class Base(DeclarativeBase):
@@ -62,6 +66,28 @@ class Track(Base):
     )
 
 
+class TrackFingerprint(Base):
+    """Chroma SimHash of a track's audio, with its indexed 16-bit bands for lookup.
+
+    Kept in its own table so existing databases pick it up via create_all
+    without altering ``tracks``.
+    """
+
+    __tablename__ = "track_fingerprints"
+
+    track_id: Mapped[int] = mapped_column(
+        ForeignKey("tracks.id", ondelete="CASCADE"), primary_key=True
+    )
+    fingerprint: Mapped[int] = mapped_column(BigInteger)
+    band0: Mapped[int] = mapped_column(Integer, index=True)
+    band1: Mapped[int] = mapped_column(Integer, index=True)
+    band2: Mapped[int] = mapped_column(Integer, index=True)
+    band3: Mapped[int] = mapped_column(Integer, index=True)
+
+
+_BAND_COLUMNS = [getattr(TrackFingerprint, f"band{i}") for i in range(NUM_BANDS)]
+
+
 # Engine and session factory (initialized in init_db)
 _engine = None
 _session_factory = None
@@ -112,6 +138,47 @@ async def get_track_by_task_id(task_id: str) -> Track | None:
         return result.scalar_one_or_none()
 
 
+async def get_tracks_by_ids(track_ids: list[int], chunk_size: int = 500) -> list[Track]:
+    """Fetch many tracks by id in one session; unknown ids are skipped.
+
+    Ids are queried in chunks to stay under SQLite's bound-variable limit.
+    """
+    tracks = []
+    async with get_session() as session:
+        for start in range(0, len(track_ids), chunk_size):
+            chunk = track_ids[start : start + chunk_size]
+            result = await session.execute(select(Track).where(Track.id.in_(chunk)))
+            tracks.extend(result.scalars().all())
+    return tracks
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """Normalize to naive UTC, the form SQLite stores created_at in."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _filter_tracks(
+    query: Select,
+    search_query: str | None = None,
+    status: str | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+) -> Select:
+    """Apply the library's track filters to a select(Track) query."""
+    if search_query:
+        pattern = f"%{search_query}%"
+        query = query.where(Track.prompt.like(pattern) | Track.lyrics.like(pattern))
+    if status:
+        query = query.where(Track.status == status)
+    if created_after:
+        query = query.where(Track.created_at >= _naive_utc(created_after))
+    if created_before:
+        query = query.where(Track.created_at < _naive_utc(created_before))
+    return query
+
+
 async def get_tracks(
     search_query: str | None = None,
     status: str | None = None,
@@ -120,20 +187,104 @@ async def get_tracks(
     """Fetch tracks with optional filters, newest first."""
     async with get_session() as session:
         query = select(Track).order_by(Track.created_at.desc())
-        if search_query:
-            pattern = f"%{search_query}%"
-            query = query.where(Track.prompt.like(pattern) | Track.lyrics.like(pattern))
-        if status:
-            query = query.where(Track.status == status)
+        query = _filter_tracks(query, search_query, status)
         query = query.limit(limit)
         result = await session.execute(query)
         return list(result.scalars().all())
 
 
+async def iter_tracks(
+    search_query: str | None = None,
+    status: str | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    with_files: bool = False,
+    page_size: int = 500,
+) -> AsyncIterator[Track]:
+    """Stream matching tracks in id order, one page (and session) at a time.
+
+    Keyset pagination keeps memory flat no matter how many tracks match.
+    """
+    last_id = 0
+    while True:
+        async with get_session() as session:
+            query = select(Track).where(Track.id > last_id).order_by(Track.id)
+            query = _filter_tracks(query, search_query, status, created_after, created_before)
+            if with_files:
+                query = query.where(Track.file_path.is_not(None))
+            result = await session.execute(query.limit(page_size))
+            page = list(result.scalars().all())
+
+        for track in page:
+            yield track
+        if len(page) < page_size:
+            return
+        last_id = page[-1].id
+
+
 async def delete_track(track_id: int) -> Track | None:
     """Delete a track by primary key. Returns the track before deletion, or None."""
     async with get_session() as session:
         track = await session.get(Track, track_id)
         if track:
+            await session.execute(
+                delete(TrackFingerprint).where(TrackFingerprint.track_id == track_id)
+            )
             await session.delete(track)
         return track
+
+
+async def save_fingerprint(track_id: int, fingerprint: int) -> None:
+    """Store (or replace) a track's fingerprint and its bands."""
+    async with get_session() as session:
+        row = await session.get(TrackFingerprint, track_id)
+        if row is None:
+            row = TrackFingerprint(track_id=track_id)
+            session.add(row)
+        row.fingerprint = fingerprint
+        for i, value in enumerate(bands(fingerprint)):
+            setattr(row, f"band{i}", value)
+
+
+async def get_fingerprint(track_id: int) -> int | None:
+    """Fetch a track's fingerprint, or None if it has not been computed."""
+    async with get_session() as session:
+        row = await session.get(TrackFingerprint, track_id)
+        return row.fingerprint if row else None
+
+
+async def find_similar_tracks(
+    fingerprint: int,
+    max_distance: int = 6,
+    exclude_track_id: int | None = None,
+    limit: int = 20,
+) -> list[tuple[Track, int]]:
+    """Find tracks whose fingerprint is within max_distance bits, closest first.
+
+    Only tracks matching one of the multi-index probes (see src/fingerprint.py)
+    are considered, so the lookup touches a small candidate set rather than
+    the whole library, without missing any track within max_distance.
+    """
+    probes = band_probes(fingerprint, max_distance)
+    conditions = [col.in_(values) for col, values in zip(_BAND_COLUMNS, probes)]
+    async with get_session() as session:
+        query = select(TrackFingerprint.track_id, TrackFingerprint.fingerprint).where(
+            or_(*conditions)
+        )
+        if exclude_track_id is not None:
+            query = query.where(TrackFingerprint.track_id != exclude_track_id)
+        candidates = (await session.execute(query)).all()
+
+        matches = sorted(
+            (dist, track_id)
+            for track_id, fp in candidates
+            if (dist := hamming(fingerprint, fp)) <= max_distance
+        )[:limit]
+        if not matches:
+            return []
+
+        result = await session.execute(
+            select(Track).where(Track.id.in_([track_id for _, track_id in matches]))
+        )
+        tracks = {track.id: track for track in result.scalars()}
+        return [(tracks[track_id], dist) for dist, track_id in matches if track_id in tracks]
@@ -0,0 +1,268 @@
+"""Bulk track export — streams a ZIP or tar of audio plus a metadata sidecar.
+
+Archives are produced on the fly: tracks are read from the database a page
+at a time and audio files are copied from disk in fixed-size chunks, so
+exporting thousands of tracks needs no temp files and about 8 bytes of
+memory per track.
+
+An export first takes a snapshot of the selected track ids from the
+database. The sidecar and the audio are both rendered from that snapshot,
+so tracks added while the archive streams do not appear. A track whose
+audio is missing from both storage tiers is listed in the sidecar but left
+out of the archive, with a warning logged.
+
+Archive layout:
+    metadata.csv | metadata.json     One entry per exported track
+    tracks/000042-ambient lounge.mp3 Audio files, prefixed with the track id
+
+The sidecar is written first so consumers can read it before the audio.
+For tar (which needs member sizes up front) the sidecar is rendered twice
+from the snapshot: once to measure it, once to write it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import json
+import logging
+import tarfile
+import time
+import zipfile
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator
+
+from src.storage import get_storage
+from src.web import database as db
+from src.web.database import Track
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+PAGE_SIZE = 500
+
+METADATA_FIELDS = [
+    "id",
+    "task_id",
+    "archive_path",
+    "prompt",
+    "lyrics",
+    "audio_duration",
+    "audio_format",
+    "bpm",
+    "key_scale",
+    "time_signature",
+    "seed",
+    "vocal_language",
+    "inference_steps",
+    "guidance_scale",
+    "status",
+    "file_size",
+    "generation_time",
+    "created_at",
+]
+
+
+@dataclass
+class ExportFilter:
+    """Track selection for an export (same filters as the library)."""
+
+    search_query: str | None = None
+    status: str | None = "completed"
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+
+    def tracks(self) -> AsyncIterator[Track]:
+        return db.iter_tracks(
+            search_query=self.search_query,
+            status=self.status,
+            created_after=self.created_after,
+            created_before=self.created_before,
+            with_files=True,
+        )
+
+
+def track_download_name(track: Track) -> str:
+    """Readable filename for a track, built from its prompt."""
+    safe_name = "".join(c if c.isalnum() or c in " -_" else "" for c in track.prompt[:40]).strip()
+    safe_name = safe_name or "track"
+    return f"{safe_name}.{track.audio_format}"
+
+
+def _archive_path(track: Track) -> str:
+    return f"tracks/{track.id:06d}-{track_download_name(track)}"
+
+
+def _metadata_row(track: Track) -> dict:
+    row = {name: getattr(track, name, None) for name in METADATA_FIELDS}
+    row["archive_path"] = _archive_path(track)
+    row["created_at"] = track.created_at.isoformat() if track.created_at else None
+    return row
+
+
+async def _snapshot(selection: ExportFilter) -> array:
+    """Ids of the selected tracks, in id order."""
+    ids = array("q")
+    async for track in selection.tracks():
+        ids.append(track.id)
+    return ids
+
+
+async def _snapshot_tracks(ids: array) -> AsyncIterator[Track]:
+    """Tracks of a snapshot in id order, one page at a time. Deleted tracks are skipped."""
+    for start in range(0, len(ids), PAGE_SIZE):
+        page = await db.get_tracks_by_ids(list(ids[start : start + PAGE_SIZE]))
+        page.sort(key=lambda track: track.id)
+        for track in page:
+            yield track
+
+
+async def _sidecar_chunks(ids: array, metadata: str) -> AsyncIterator[bytes]:
+    """Render the metadata sidecar incrementally, one track at a time."""
+    if metadata == "csv":
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=METADATA_FIELDS)
+        writer.writeheader()
+        async for track in _snapshot_tracks(ids):
+            writer.writerow(_metadata_row(track))
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+        yield buf.getvalue().encode("utf-8")
+        return
+
+    yield b"["
+    first = True
+    async for track in _snapshot_tracks(ids):
+        prefix = b"\n" if first else b",\n"
+        first = False
+        yield prefix + json.dumps(_metadata_row(track), ensure_ascii=False).encode("utf-8")
+    yield b"\n]\n"
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable sink that hands written bytes back out via drain()."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def _read_chunks(path: Path) -> AsyncIterator[bytes]:
+    with path.open("rb") as f:
+        while chunk := await asyncio.to_thread(f.read, CHUNK_SIZE):
+            yield chunk
+
+
+async def _audio_files(ids: array) -> AsyncIterator[tuple[Track, Path]]:
+    """Yield (track, local path) for each track of the snapshot."""
+    storage = get_storage()
+    async for track in _snapshot_tracks(ids):
+        path = await storage.fetch(Path(track.file_path).name)
+        if path is None:
+            log.warning("Audio for track %d is missing; leaving it out of the export", track.id)
+            continue
+        yield track, path
+
+
+async def stream_zip(selection: ExportFilter, metadata: str = "csv") -> AsyncIterator[bytes]:
+    """Stream a ZIP archive (audio stored, sidecar deflated)."""
+    ids = await _snapshot(selection)
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w") as zf:
+        info = zipfile.ZipInfo(f"metadata.{metadata}", time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with zf.open(info, "w") as dest:
+            async for chunk in _sidecar_chunks(ids, metadata):
+                dest.write(chunk)
+                if data := sink.drain():
+                    yield data
+
+        async for track, path in _audio_files(ids):
+            stat = path.stat()
+            info = zipfile.ZipInfo(_archive_path(track), time.localtime(stat.st_mtime)[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            info.file_size = stat.st_size
+            with zf.open(info, "w") as dest:
+                async for chunk in _read_chunks(path):
+                    dest.write(chunk)
+                    if data := sink.drain():
+                        yield data
+    # Closing the ZipFile wrote the last data descriptor and central directory
+    yield sink.drain()
+
+
+def _tar_header(name: str, size: int, mtime: float) -> bytes:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    return info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+
+
+def _tar_padding(size: int) -> bytes:
+    return b"\0" * (-size % tarfile.BLOCKSIZE)
+
+
+async def stream_tar(selection: ExportFilter, metadata: str = "csv") -> AsyncIterator[bytes]:
+    """Stream an uncompressed tar archive."""
+    ids = await _snapshot(selection)
+    size = 0
+    async for chunk in _sidecar_chunks(ids, metadata):
+        size += len(chunk)
+    yield _tar_header(f"metadata.{metadata}", size, time.time())
+    written = 0
+    async for chunk in _sidecar_chunks(ids, metadata):
+        # Both passes render the same snapshot; only a track deleted in between
+        # can shorten the second, and blank lines keep CSV and JSON valid
+        chunk = chunk[: size - written]
+        written += len(chunk)
+        yield chunk
+    yield b"\n" * (size - written) + _tar_padding(size)
+
+    async for track, path in _audio_files(ids):
+        stat = path.stat()
+        yield _tar_header(_archive_path(track), stat.st_size, stat.st_mtime)
+        written = 0
+        async for chunk in _read_chunks(path):
+            chunk = chunk[: stat.st_size - written]
+            written += len(chunk)
+            yield chunk
+        yield b"\0" * (stat.st_size - written) + _tar_padding(stat.st_size)
+
+    yield b"\0" * (2 * tarfile.BLOCKSIZE)
+
+
+def stream_archive(
+    selection: ExportFilter,
+    archive_format: str = "zip",
+    metadata: str = "csv",
+) -> AsyncIterator[bytes]:
+    """Stream an export archive. archive_format is "zip" or "tar"; metadata "csv" or "json"."""
+    if metadata not in ("csv", "json"):
+        raise ValueError(f"Unsupported metadata format: {metadata}")
+    if archive_format == "zip":
+        return stream_zip(selection, metadata)
+    if archive_format == "tar":
+        return stream_tar(selection, metadata)
+    raise ValueError(f"Unsupported archive format: {archive_format}")
+
+
+def export_filename(archive_format: str) -> str:
+    """Timestamped archive filename, e.g. ace-music-export-20260219-101500.zip."""
+    return f"ace-music-export-{datetime.now():%Y%m%d-%H%M%S}.{archive_format}"
@@ -5,69 +5,197 @@ from __future__ import annotations
 import asyncio
 import logging
 import time
+import uuid
 from datetime import datetime, timezone
 from pathlib import Path
 
+from pydantic import ValidationError
+from sqlalchemy import select, update
+
+from src import tracing
 from src.ace_client import AceStepClient, GenerationParams
 from src.config import get_settings
+from src.fingerprint import compute_fingerprint
+from src.scheduler import Priority, Slot, get_scheduler
+from src.storage import get_storage
+from src.web import database as db
+from src.web.admission import Ticket, get_admission
 from src.web.database import Track, get_session
 
 log = logging.getLogger(__name__)
 
+_fingerprint_slots: asyncio.Semaphore | None = None
+
+# Tracks with a live _poll_and_update task in this process; reconciliation skips them
+_active_polls: set[int] = set()
+
+# One reconciliation at a time (background loop and the library's refresh button)
+_reconcile_lock = asyncio.Lock()
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+# Task id of a track admitted while the server was busy, until it is submitted
+PENDING_TASK_PREFIX = "pending-"
 
-async def submit_generation(params: GenerationParams) -> Track:
+
+async def submit_generation(
+    params: GenerationParams,
+    priority: Priority = Priority.INTERACTIVE,
+    user: str = "",
+) -> Track:
     """Submit a generation task to ACE-Step and save to database.
 
-    Creates a Track record, submits to the API, then fires a background
-    task to poll for completion. Returns immediately with the queued track.
+    Passes admission control, then submits right away if a scheduler slot
+    is free. Otherwise the track is saved as queued (with a placeholder
+    task id) and submitted in the background once a slot frees up. Either
+    way a background task polls for completion and the queued track is
+    returned immediately.
+
+    Raises RateLimitExceeded (or QueueFull) if the submission is not admitted.
     """
     settings = get_settings()
+    scheduler = get_scheduler(settings.acestep_api_url)
+    admission = get_admission()
+    ticket = admission.admit(user, priority=priority)
+
+    slot = scheduler.try_acquire(priority)
+    if slot is None:
+        # Server busy: hold the track locally, bounded by the admission queue
+        return (await _queue_generations([params], priority, ticket))[0]
+    admission.release(ticket)
 
     # Submit to ACE-Step API
-    async with AceStepClient(settings.acestep_api_url, settings.acestep_api_key) as client:
-        task_id = await client.generate(params)
-
-    # Save to database
-    track = Track(
-        task_id=task_id,
-        prompt=params.prompt,
-        lyrics=params.lyrics or None,
-        audio_duration=params.audio_duration,
-        bpm=params.bpm,
-        key_scale=params.key_scale or None,
-        time_signature=params.time_signature or None,
-        seed=params.seed,
-        batch_size=params.batch_size,
-        audio_format=params.audio_format,
-        task_type=params.task_type,
-        vocal_language=params.vocal_language,
-        inference_steps=params.inference_steps,
-        guidance_scale=params.guidance_scale,
-        thinking=params.thinking,
-        status="queued",
-        generation_params=params.model_dump(),
-    )
-    async with get_session() as session:
-        session.add(track)
-        await session.flush()
-        track_id = track.id
+    try:
+        async with AceStepClient(settings.acestep_api_url, settings.acestep_api_key) as client:
+            task_id = await client.generate(params)
+        [track] = await _create_tracks([(params, task_id)])
+    except BaseException:
+        scheduler.release(slot)
+        raise
 
-    # Fire background polling task
-    asyncio.create_task(_poll_and_update(track_id, task_id))
+    # Fire background polling task (owns the slot from here on)
+    _active_polls.add(track.id)
+    asyncio.create_task(_poll_and_update(track.id, task_id, slot))
     return track
 
 
-async def _poll_and_update(track_id: int, task_id: str) -> None:
+async def submit_generations(
+    params_list: list[GenerationParams],
+    priority: Priority = Priority.BATCH,
+    user: str = "",
+) -> list[Track]:
+    """Queue many generation tasks at once (the bulk JSON API).
+
+    The whole request passes admission control as one unit, all tracks are
+    inserted in a single transaction, and one background task submits them
+    in order as scheduler slots free up. Returns the queued tracks.
+
+    Raises RateLimitExceeded (or QueueFull) if the request is not admitted.
+    """
+    if not params_list:
+        return []
+    ticket = get_admission().admit(user, count=len(params_list), priority=priority)
+    return await _queue_generations(params_list, priority, ticket)
+
+
+async def _queue_generations(
+    params_list: list[GenerationParams], priority: Priority, ticket: Ticket
+) -> list[Track]:
+    """Save admitted jobs as queued tracks and start submitting them in the background."""
+    try:
+        tracks = await _create_tracks([
+            (params, f"{PENDING_TASK_PREFIX}{uuid.uuid4().hex}") for params in params_list
+        ])
+    except BaseException:
+        get_admission().release(ticket)
+        raise
+    _active_polls.update(track.id for track in tracks)
+    jobs = [(track.id, params) for track, params in zip(tracks, params_list)]
+    asyncio.create_task(_submit_queued(jobs, priority, ticket))
+    return tracks
+
+
+async def _create_tracks(jobs: list[tuple[GenerationParams, str]]) -> list[Track]:
+    """Save a queued Track row per (params, task_id), all in one transaction."""
+    tracks = [
+        Track(
+            task_id=task_id,
+            prompt=params.prompt,
+            lyrics=params.lyrics or None,
+            audio_duration=params.audio_duration,
+            bpm=params.bpm,
+            key_scale=params.key_scale or None,
+            time_signature=params.time_signature or None,
+            seed=params.seed,
+            batch_size=params.batch_size,
+            audio_format=params.audio_format,
+            task_type=params.task_type,
+            vocal_language=params.vocal_language,
+            inference_steps=params.inference_steps,
+            guidance_scale=params.guidance_scale,
+            thinking=params.thinking,
+            status="queued",
+            generation_params=params.model_dump(),
+        )
+        for params, task_id in jobs
+    ]
+    with tracing.span("db.insert", count=len(tracks)):
+        async with get_session() as session:
+            session.add_all(tracks)
+            await session.flush()
+    return tracks
+
+
+async def _submit_queued(
+    jobs: list[tuple[int, GenerationParams]], priority: Priority, ticket: Ticket
+) -> None:
+    """Background task: submit queued tracks in order as slots free up.
+
+    Each submitted track gets its own polling task, which owns its slot.
+    """
+    settings = get_settings()
+    scheduler = get_scheduler(settings.acestep_api_url)
+    admission = get_admission()
+    try:
+        async with AceStepClient(settings.acestep_api_url, settings.acestep_api_key) as client:
+            for track_id, params in jobs:
+                slot = await scheduler.acquire(priority)
+                admission.release(ticket, 1)
+                try:
+                    task_id = await client.generate(params)
+                    with tracing.span("db.update", task_id=task_id, status="submitted"):
+                        async with get_session() as session:
+                            track = await session.get(Track, track_id)
+                            if track:
+                                track.task_id = task_id
+                                track.updated_at = datetime.now(timezone.utc)
+                except Exception as e:
+                    scheduler.release(slot)
+                    _active_polls.discard(track_id)
+                    log.exception("Queued submission failed for track %d", track_id)
+                    await _mark_failed(track_id, f"Failed to submit: {e}")
+                    continue
+                asyncio.create_task(_poll_and_update(track_id, task_id, slot))
+    finally:
+        admission.release(ticket)
+
+
+async def _poll_and_update(track_id: int, task_id: str, slot: Slot) -> None:
     """Background task: poll ACE-Step API until done, update database."""
+    tracing.set_task(task_id)
     settings = get_settings()
+    scheduler = get_scheduler(settings.acestep_api_url)
 
     # Mark as generating and get audio format
-    async with get_session() as session:
-        track = await session.get(Track, track_id)
-        if not track:
-            return
-        track.status = "generating"
-        audio_format = track.audio_format
+    with tracing.span("db.update", status="generating"):
+        async with get_session() as session:
+            track = await session.get(Track, track_id)
+            if not track:
+                scheduler.release(slot)
+                _active_polls.discard(track_id)
+                return
+            track.status = "generating"
+            audio_format = track.audio_format
 
     start_time = time.monotonic()
 
@@ -78,39 +206,233 @@ async def _poll_and_update(track_id: int, task_id: str) -> None:
                 poll_interval=settings.poll_interval,
                 timeout=settings.poll_timeout,
             )
+            # The server is done with the task; free its slot before downloading
+            scheduler.release(slot)
 
-            # Download audio file
-            filename = f"{task_id}.{audio_format}"
-            output_dir = Path(settings.output_dir)
-            output_dir.mkdir(parents=True, exist_ok=True)
-            output_path = await client.download_audio(result.result, output_dir / filename)
+            # Download audio file into the hot cache (archived to cold tier if set)
+            storage = get_storage()
+            output_path = await client.download_audio(
+                result.result,
+                storage.path_for(f"{task_id}.{audio_format}"),
+                storage,
+            )
 
             elapsed = time.monotonic() - start_time
 
             # Update track as completed
-            async with get_session() as session:
-                track = await session.get(Track, track_id)
-                if track:
-                    track.status = "completed"
-                    track.file_path = str(output_path)
-                    track.file_size = output_path.stat().st_size
-                    track.generation_time = round(elapsed, 1)
-                    track.updated_at = datetime.now(timezone.utc)
+            with tracing.span("db.update", status="completed"):
+                async with get_session() as session:
+                    track = await session.get(Track, track_id)
+                    if track:
+                        track.status = "completed"
+                        track.file_path = str(output_path)
+                        track.file_size = output_path.stat().st_size
+                        track.generation_time = round(elapsed, 1)
+                        track.updated_at = datetime.now(timezone.utc)
 
             log.info("Track %d completed in %.1fs: %s", track_id, elapsed, output_path)
 
+            # Fingerprint off the critical path; the track is already usable
+            asyncio.create_task(fingerprint_track(track_id, output_path))
+
     except TimeoutError:
         await _mark_failed(track_id, f"Timeout after {settings.poll_timeout}s")
     except Exception as e:
         log.exception("Generation failed for track %d", track_id)
         await _mark_failed(track_id, str(e))
+    finally:
+        scheduler.release(slot)
+        _active_polls.discard(track_id)
+
+
+async def reconcile_tracks(chunk_size: int = 100, download_concurrency: int = 4) -> dict[str, int]:
+    """Bring every non-terminal track in line with the ACE-Step server.
+
+    Repairs tracks whose polling task was lost (restart, crash): all queued
+    and generating rows without a live poller are checked with a few chunked
+    query_result calls, finished audio is downloaded, and every state change
+    is applied in one transaction. Tasks still running are left for the next
+    pass. Tracks that were admitted but never submitted are queued again
+    from their stored params, in the batch lane. Returns counts per outcome.
+
+    Concurrent calls run one after another, so no track is downloaded or
+    fingerprinted twice.
+    """
+    async with _reconcile_lock:
+        return await _reconcile_tracks(chunk_size, download_concurrency)
+
+
+async def _reconcile_tracks(chunk_size: int, download_concurrency: int) -> dict[str, int]:
+    settings = get_settings()
+    async with get_session() as session:
+        result = await session.execute(
+            select(
+                Track.id,
+                Track.task_id,
+                Track.audio_format,
+                Track.updated_at,
+                Track.generation_params,
+            )
+            .where(Track.status.not_in(TERMINAL_STATUSES))
+            .order_by(Track.id)
+        )
+        rows = [row for row in result.all() if row.id not in _active_polls]
+
+    counts = {"checked": len(rows), "completed": 0, "failed": 0, "running": 0, "requeued": 0}
+    if not rows:
+        return counts
+
+    now = datetime.now(timezone.utc)
+    updates: dict[int, dict] = {}
+    slots = asyncio.Semaphore(download_concurrency)
+    storage = get_storage()
+
+    async with AceStepClient(settings.acestep_api_url, settings.acestep_api_key) as client:
+
+        async def download(row, audio_path: str) -> None:
+            async with slots:
+                try:
+                    output_path = await client.download_audio(
+                        audio_path, storage.path_for(f"{row.task_id}.{row.audio_format}"), storage
+                    )
+                except Exception as e:
+                    error = f"Download failed: {e}"
+                    updates[row.id] = {"status": "failed", "error_message": error}
+                    return
+            updates[row.id] = {
+                "status": "completed",
+                "file_path": str(output_path),
+                "file_size": output_path.stat().st_size,
+                "generation_time": round((now - _submitted_at(row)).total_seconds(), 1),
+            }
+
+        downloads = []
+        submitted = []
+        running: list[int] = []
+        requeue: list[tuple[int, GenerationParams]] = []
+        for row in rows:
+            if not row.task_id.startswith(PENDING_TASK_PREFIX):
+                submitted.append(row)
+                continue
+            # Admitted while the server was busy, never submitted before a restart
+            try:
+                requeue.append((row.id, GenerationParams(**(row.generation_params or {}))))
+            except ValidationError as e:
+                error = f"Not submitted before the web app restarted: {e}"
+                updates[row.id] = {"status": "failed", "error_message": error}
+        for start in range(0, len(submitted), chunk_size):
+            chunk = submitted[start : start + chunk_size]
+            results = {r.task_id: r for r in await client.poll_results([r.task_id for r in chunk])}
+            for row in chunk:
+                task = results.get(row.task_id)
+                age = (now - _submitted_at(row)).total_seconds()
+                if task is None:
+                    error = "Task lost on ACE-Step server"
+                    updates[row.id] = {"status": "failed", "error_message": error}
+                elif task.status == 1:
+                    downloads.append(download(row, task.result))
+                elif task.status == 2:
+                    error = task.result or "Generation failed."
+                    updates[row.id] = {"status": "failed", "error_message": error}
+                elif age > settings.poll_timeout:
+                    error = f"Timeout after {settings.poll_timeout}s"
+                    updates[row.id] = {"status": "failed", "error_message": error}
+                else:
+                    running.append(row.id)
+        await asyncio.gather(*downloads)
+
+    if requeue:
+        _active_polls.update(track_id for track_id, _ in requeue)
+        ticket = get_admission().hold(len(requeue), Priority.BATCH)
+        asyncio.create_task(_submit_queued(requeue, Priority.BATCH, ticket))
+        counts["requeued"] = len(requeue)
+
+    with tracing.span("db.update", status="reconcile", count=len(updates)):
+        async with get_session() as session:
+            result = await session.execute(select(Track).where(Track.id.in_(list(updates))))
+            for track in result.scalars():
+                if track.id in _active_polls or track.status in TERMINAL_STATUSES:
+                    continue
+                for field, value in updates[track.id].items():
+                    setattr(track, field, value)
+                track.updated_at = now
+            if running:
+                # Keep updated_at as is: the timeout above is measured from it
+                await session.execute(
+                    update(Track)
+                    .where(Track.id.in_(running), Track.status == "queued")
+                    .values(status="generating", updated_at=Track.updated_at)
+                )
+        counts["running"] = len(running)
+
+    for track_id, changes in updates.items():
+        status = changes["status"]
+        counts[status] += 1
+        if status == "completed":
+            asyncio.create_task(fingerprint_track(track_id, Path(changes["file_path"])))
+
+    log.info("Reconciled %(checked)d tracks: %(completed)d completed, %(failed)d failed, "
+             "%(running)d still running, %(requeued)d queued again", counts)
+    return counts
+
+
+def _submitted_at(row) -> datetime:
+    """When a track's task was submitted: set on submission, kept while it runs."""
+    return row.updated_at.replace(tzinfo=timezone.utc)
+
+
+async def reconcile_loop(interval: float) -> None:
+    """Run reconcile_tracks now and then every ``interval`` seconds."""
+    while True:
+        try:
+            await reconcile_tracks()
+        except Exception:
+            log.exception("Track reconciliation failed")
+        await asyncio.sleep(interval)
 
 
 async def _mark_failed(track_id: int, error: str) -> None:
     """Mark a track as failed with an error message."""
-    async with get_session() as session:
-        track = await session.get(Track, track_id)
-        if track:
-            track.status = "failed"
-            track.error_message = error
-            track.updated_at = datetime.now(timezone.utc)
+    with tracing.span("db.update", status="failed"):
+        async with get_session() as session:
+            track = await session.get(Track, track_id)
+            if track:
+                track.status = "failed"
+                track.error_message = error
+                track.updated_at = datetime.now(timezone.utc)
+
+
+async def fingerprint_track(track_id: int, path: Path) -> None:
+    """Compute and store a track's fingerprint, logging any near-duplicates.
+
+    CPU work runs in a worker thread, limited to fingerprint_workers at a
+    time so a burst of completions cannot starve the event loop's executor.
+    """
+    global _fingerprint_slots
+    settings = get_settings()
+    if _fingerprint_slots is None:
+        _fingerprint_slots = asyncio.Semaphore(settings.fingerprint_workers)
+
+    try:
+        local_path = await get_storage().fetch(path.name)
+        if local_path is None:
+            return
+        async with _fingerprint_slots:
+            fingerprint = await asyncio.to_thread(compute_fingerprint, local_path)
+        await db.save_fingerprint(track_id, fingerprint)
+        similar = await db.find_similar_tracks(
+            fingerprint,
+            max_distance=settings.fingerprint_max_distance,
+            exclude_track_id=track_id,
+            limit=5,
+        )
+    except Exception:
+        log.exception("Fingerprinting failed for track %d", track_id)
+        return
+
+    if similar:
+        log.info(
+            "Track %d is a near-duplicate of %s",
+            track_id,
+            ", ".join(f"#{track.id} (distance {dist})" for track, dist in similar),
+        )
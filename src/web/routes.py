@@ -2,25 +2,38 @@
 
 from __future__ import annotations
 
+import html
 import logging
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated
 
 from fastapi import APIRouter, Form, HTTPException, Request
-from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse, StreamingResponse
 
 from src.ace_client import GenerationParams
 from src.config import get_settings
+from src.storage import get_storage
 from src.web import database as db
-from src.web.generation import submit_generation
+from src.web.admission import QueueFull, RateLimitExceeded
+from src.web.export import ExportFilter, export_filename, stream_archive, track_download_name
+from src.web.generation import reconcile_tracks, submit_generation
+
+if TYPE_CHECKING:
+    from fastapi.templating import Jinja2Templates
 
 log = logging.getLogger(__name__)
 
 router = APIRouter()
-templates = Jinja2Templates(directory=str(Path(__file__).parent.parent / "templates"))
 
-settings = get_settings()
+
+@lru_cache(maxsize=1)
+def get_templates() -> Jinja2Templates:
+    """Build the Jinja2 environment on first render rather than at import."""
+    from fastapi.templating import Jinja2Templates
+
+    return Jinja2Templates(directory=str(Path(__file__).parent.parent / "templates"))
 
 
 # ── Pages ────────────────────────────────────────────────────────────────────
@@ -40,7 +53,8 @@ async def generate_page(
     audio_format: str = "",
 ):
     """Show the music generation form. Supports pre-fill via query params for re-generate."""
-    return templates.TemplateResponse("generate.html", {
+    settings = get_settings()
+    return get_templates().TemplateResponse("generate.html", {
         "request": request,
         "settings": settings,
         "prefill_prompt": prompt,
@@ -53,7 +67,7 @@ async def generate_page(
 async def library_page(request: Request, search: str = ""):
     """Show the track library."""
     tracks = await db.get_tracks(search_query=search or None)
-    return templates.TemplateResponse("library.html", {
+    return get_templates().TemplateResponse("library.html", {
         "request": request,
         "tracks": tracks,
         "search": search,
@@ -80,7 +94,7 @@ async def api_generate(
 ):
     """Submit a generation task. Returns progress partial for HTMX."""
     if not prompt.strip():
-        return templates.TemplateResponse("partials/error.html", {
+        return get_templates().TemplateResponse("partials/error.html", {
             "request": request,
             "message": "Prompt is required.",
         })
@@ -99,16 +113,26 @@ async def api_generate(
         thinking=thinking == "on",
     )
 
+    user = request.client.host if request.client else ""
     try:
-        track = await submit_generation(params)
+        track = await submit_generation(params, user=user)
+    except RateLimitExceeded as e:
+        if isinstance(e, QueueFull):
+            message = f"The server is busy. Please retry in {e.retry_after:.0f}s."
+        else:
+            message = f"Too many submissions. Please retry in {e.retry_after:.0f}s."
+        return get_templates().TemplateResponse("partials/error.html", {
+            "request": request,
+            "message": message,
+        }, status_code=429, headers={"Retry-After": str(int(e.retry_after) + 1)})
     except Exception as e:
         log.exception("Generation submission failed")
-        return templates.TemplateResponse("partials/error.html", {
+        return get_templates().TemplateResponse("partials/error.html", {
             "request": request,
             "message": f"Failed to submit: {e}",
         })
 
-    return templates.TemplateResponse("partials/progress.html", {
+    return get_templates().TemplateResponse("partials/progress.html", {
         "request": request,
         "track": track,
     })
@@ -125,19 +149,19 @@ async def api_track_status(request: Request, track_id: int):
         raise HTTPException(status_code=404, detail="Track not found")
 
     if track.status in ("queued", "generating"):
-        return templates.TemplateResponse("partials/progress.html", {
+        return get_templates().TemplateResponse("partials/progress.html", {
             "request": request,
             "track": track,
         })
 
     if track.status == "completed":
-        return templates.TemplateResponse("partials/result.html", {
+        return get_templates().TemplateResponse("partials/result.html", {
             "request": request,
             "track": track,
         })
 
     # Failed
-    return templates.TemplateResponse("partials/error.html", {
+    return get_templates().TemplateResponse("partials/error.html", {
         "request": request,
         "message": track.error_message or "Generation failed.",
     })
@@ -146,6 +170,18 @@ async def api_track_status(request: Request, track_id: int):
 # ── Track Management ─────────────────────────────────────────────────────────
 
 
+@router.get("/audio/{filename}")
+async def audio_file(filename: str):
+    """Serve an audio file from the hot cache, restoring it from cold storage if evicted."""
+    if Path(filename).name != filename:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+
+    path = await get_storage().fetch(filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    return FileResponse(path)
+
+
 @router.get("/api/tracks/{track_id}/download")
 async def api_download_track(track_id: int):
     """Download a track file."""
@@ -153,14 +189,11 @@ async def api_download_track(track_id: int):
     if not track or not track.file_path:
         raise HTTPException(status_code=404, detail="Track not found")
 
-    path = Path(track.file_path)
-    if not path.exists():
+    path = await get_storage().fetch(Path(track.file_path).name)
+    if path is None:
         raise HTTPException(status_code=404, detail="Audio file not found")
 
-    # Build a readable filename from prompt
-    safe_name = "".join(c if c.isalnum() or c in " -_" else "" for c in track.prompt[:40]).strip()
-    safe_name = safe_name or "track"
-    filename = f"{safe_name}.{track.audio_format}"
+    filename = track_download_name(track)
 
     return FileResponse(
         path,
@@ -170,6 +203,69 @@ async def api_download_track(track_id: int):
     )
 
 
+@router.post("/api/tracks/reconcile", response_class=HTMLResponse)
+async def api_reconcile_tracks():
+    """Re-sync all queued/generating tracks with the ACE-Step server in bulk."""
+    try:
+        counts = await reconcile_tracks()
+    except Exception as e:
+        log.exception("Reconciliation failed")
+        return HTMLResponse(f"<small>Refresh failed: {html.escape(str(e))}</small>")
+    return HTMLResponse(
+        f"<small>Checked {counts['checked']}: {counts['completed']} completed, "
+        f"{counts['failed']} failed, {counts['running']} still running, "
+        f"{counts['requeued']} queued again. "
+        f'<a href="/library">Reload</a></small>'
+    )
+
+
+@router.get("/api/tracks/{track_id}/similar", response_class=HTMLResponse)
+async def api_similar_tracks(request: Request, track_id: int):
+    """List near-duplicates of a track by audio fingerprint."""
+    fingerprint = await db.get_fingerprint(track_id)
+    similar = []
+    if fingerprint is not None:
+        similar = await db.find_similar_tracks(
+            fingerprint,
+            max_distance=get_settings().fingerprint_max_distance,
+            exclude_track_id=track_id,
+        )
+    return get_templates().TemplateResponse("partials/similar.html", {
+        "request": request,
+        "fingerprinted": fingerprint is not None,
+        "similar": similar,
+    })
+
+
+@router.get("/api/export")
+async def api_export_tracks(
+    archive: str = "zip",
+    metadata: str = "csv",
+    status: str = "completed",
+    search: str = "",
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    """Stream matching tracks as a ZIP or tar with a metadata sidecar."""
+    selection = ExportFilter(
+        search_query=search or None,
+        status=status or None,
+        created_after=since,
+        created_before=until,
+    )
+    try:
+        body = stream_archive(selection, archive, metadata)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filename = export_filename(archive)
+    return StreamingResponse(
+        body,
+        media_type="application/zip" if archive == "zip" else "application/x-tar",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.delete("/api/tracks/{track_id}", response_class=HTMLResponse)
 async def api_delete_track(track_id: int):
     """Delete a track (file + database record). Returns empty for HTMX swap."""
@@ -177,11 +273,9 @@ async def api_delete_track(track_id: int):
     if not track:
         raise HTTPException(status_code=404, detail="Track not found")
 
-    # Remove audio file if it exists
+    # Remove audio file from hot cache and cold archive
     if track.file_path:
-        path = Path(track.file_path)
-        if path.exists():
-            path.unlink()
-            log.info("Deleted audio file: %s", path)
+        await get_storage().delete(Path(track.file_path).name)
+        log.info("Deleted audio file: %s", track.file_path)
 
     return HTMLResponse("")
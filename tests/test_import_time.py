@@ -0,0 +1,63 @@
+"""Import-time budget for CLI and web entry points.
+
+Each module is imported in a fresh interpreter with ``-X importtime``; the
+fastest of a few imports must stay under its budget, and lightweight
+modules must not drag in heavy dependencies. Set IMPORT_TIME_SCALE=2 on slow CI
+runners to multiply every budget.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_DIR = Path(__file__).parent.parent
+SCALE = float(os.environ.get("IMPORT_TIME_SCALE", "1"))
+RUNS = 3  # Best of a few imports filters out scheduler noise
+
+# module -> (budget in ms, modules it must not import). Budgets sit just above
+# the measured best-of-RUNS times on a development machine, so a real
+# regression fails.
+BUDGETS: dict[str, tuple[float, tuple[str, ...]]] = {
+    "src.config": (320, ("httpx", "fastapi", "sqlalchemy", "jinja2")),
+    "src.storage": (220, ("httpx", "fastapi", "sqlalchemy", "jinja2")),
+    "src.ace_client": (360, ("fastapi", "sqlalchemy", "jinja2")),
+    "src.batch": (320, ("fastapi", "sqlalchemy", "jinja2")),
+    "src.web.app": (850, ("jinja2",)),
+}
+
+
+def measure(module: str) -> tuple[float, set[str]]:
+    """Return (cumulative import ms, names of all imported modules)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total_us = 0
+    imported = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        imported.add(name)
+        if name == module:
+            total_us = int(cumulative)
+    return total_us / 1000, imported
+
+
+@pytest.mark.parametrize("module", BUDGETS)
+def test_import_time_within_budget(module: str) -> None:
+    budget_ms, forbidden = BUDGETS[module]
+    elapsed_ms, imported = min(measure(module) for _ in range(RUNS))
+
+    leaked = sorted(m for m in forbidden if m in imported)
+    assert not leaked, f"{module} imports heavy modules: {', '.join(leaked)}"
+    assert elapsed_ms <= budget_ms * SCALE, (
+        f"{module} took {elapsed_ms:.1f} ms to import (budget {budget_ms * SCALE:.0f} ms)"
+    )